@@ -4,6 +4,7 @@ from fastapi import Depends, HTTPException, status
 from app.models.users import User, TokenPayload
 from app.core.config import settings
 from app.core import security
+from app.services.user_service import UserService
 from typing import Annotated
 import jwt
 from jwt.exceptions import InvalidTokenError
@@ -15,6 +16,8 @@ reusable_oauth2 = OAuth2PasswordBearer(
 
 TokenDep = Annotated[str, Depends(reusable_oauth2)]
 
+user_service = UserService()
+
 async def get_current_user(token: TokenDep) -> User:
     try:
         payload = jwt.decode(
@@ -28,7 +31,7 @@ async def get_current_user(token: TokenDep) -> User:
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = await User.find_one(User.user_id == token_data.sub)
+    user = await user_service.get_by_user_id(token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
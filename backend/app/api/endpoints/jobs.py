@@ -1,23 +1,31 @@
-from typing import Annotated, Optional
+from typing import Annotated, AsyncIterator, Literal, Optional
+from datetime import datetime
 import asyncio
+import base64
+import json
 import uuid
 
-from fastapi import APIRouter, Query, HTTPException
+from fastapi import APIRouter, Header, Query, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from beanie.operators import In
+from beanie.odm.utils.encoder import Encoder
+from bson import Binary
+import httpx
 
 from app.models.jobs import Job
 from app.models.links import JobUserLink
 from app.services.job_search_service import JobSearchService
+from app.services.bulk_write_service import bulk_upsert_job_user_links
+from app.services.refresh_scheduler import refresh_scheduler
+from app.services.scrape_queue import ScrapeTaskError
 from app.core.config import settings
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.http_client import THROTTLE_STATUS_CODES, retry_after_seconds
+from app.core.metrics import DB_QUERY_SECONDS
+from app.core.responses import ORJSONResponse, etag_matches
 
 from app.api.deps import CurrentUser
 
-JOB_USER_NAMESPACE = uuid.UUID('f27dcd16-431c-11f0-93a8-02b932676a17')
-
-def make_job_user_link_id(job_id: int, user_id: uuid.UUID) -> uuid.UUID:
-    return uuid.uuid5(JOB_USER_NAMESPACE, f"{job_id}:{user_id}")
-
 router = APIRouter()
 
 class JobSearchQuery(BaseModel):
@@ -26,49 +34,274 @@ class JobSearchQuery(BaseModel):
     max_days_since_posted: int = Field(default=1, gt=0, le=120)
     limit: int = Field(default=10, gt=0, le=100)
 
+def scraper_error_to_http(e: Exception) -> HTTPException:
+    """503 while LinkedIn is throttling us or the scrape workers are behind, 502 when it fails or can't be reached"""
+    if isinstance(e, ScrapeTaskError) and e.timed_out:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='job search is temporarily unavailable, try again later',
+        )
+    if isinstance(e, CircuitOpenError):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='job search is temporarily unavailable, try again later',
+            headers={'Retry-After': str(max(int(e.retry_after), 1))},
+        )
+    if isinstance(e, httpx.HTTPStatusError) and e.response.status_code in THROTTLE_STATUS_CODES:
+        retry_after = retry_after_seconds(e.response)
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail='job search is temporarily unavailable, try again later',
+            headers={'Retry-After': str(max(int(retry_after), 1))} if retry_after is not None else None,
+        )
+    return HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail='job search failed upstream')
+
+# fields a sparse fieldset can ask for
+JOB_FIELDS = (Job.model_fields.keys() - {'id', 'revision_id'}) | {'job_link'}
+JOB_FIELDS_DESCRIPTION = 'comma-separated job fields to return, e.g. "title,company,job_link". all fields if not set'
+
+def parse_job_fields(fields: str | None) -> list[str] | None:
+    """the fields of a sparse fieldset, None for whole jobs"""
+    if not fields:
+        return None
+    job_fields = list(dict.fromkeys(field.strip() for field in fields.split(',') if field.strip()))
+    unknown_fields = [field for field in job_fields if field not in JOB_FIELDS]
+    if unknown_fields:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f'unknown job fields: {", ".join(unknown_fields)}'
+        )
+    return job_fields
+
+def job_projection(job_fields: list[str]) -> dict:
+    # job_link is built from job_id, and the etag from last_updated
+    projection = {'_id': 0, 'job_id': 1, 'last_updated': 1}
+    projection.update((field, 1) for field in job_fields if field != 'job_link')
+    return projection
+
+def sparse_job(document: dict, job_fields: list[str]) -> dict:
+    return {
+        field: Job.link_for(document['job_id']) if field == 'job_link' else document.get(field)
+        for field in job_fields
+    }
+
+def job_etag(job_id: int, last_updated: datetime) -> str:
+    # weak, the job is the same even if its representation isn't byte for byte
+    return f'W/"{job_id}-{last_updated:%Y%m%d%H%M%S%f}"'
+
+class JobSearchFieldsQuery(JobSearchQuery):
+    fields: Optional[str] = Field(default=None, description=JOB_FIELDS_DESCRIPTION)
+
 @router.get('/search')
-async def search_jobs(current_user: CurrentUser, q: Annotated[JobSearchQuery, Query()]) -> list[Job]:
-    job_search_service = JobSearchService(**q.model_dump())
-    jobs = await job_search_service.search()
+async def search_jobs(current_user: CurrentUser, q: Annotated[JobSearchFieldsQuery, Query()]) -> list[Job]:
+    job_fields = parse_job_fields(q.fields)
+    search_query = q.model_dump(exclude={'fields'})
+    refresh_scheduler.record_search(**search_query)
+    job_search_service = JobSearchService(**search_query)
+    try:
+        jobs = await job_search_service.search()
+    except (CircuitOpenError, ScrapeTaskError, httpx.HTTPError) as e:
+        settings.logger.warning(f'search failed upstream - {type(e).__name__}: {e}')
+        raise scraper_error_to_http(e)
     settings.logger.info(f'total jobs returned: {len(jobs)}')
 
-    await asyncio.gather(
-        *[
-            JobUserLink(
-                id=make_job_user_link_id(job.job_id, current_user.user_id),
-                job_id=job.job_id,
-                user_id=current_user.user_id
-                ).save()
-            for job in jobs
-        ]
-    )
-    
+    link_summary = await bulk_upsert_job_user_links([job.job_id for job in jobs], current_user.user_id)
+    settings.logger.info(f'job user links: {link_summary}')
+
+    if job_fields is not None:
+        # jobs come from the cache, the db or the scraper, so the fieldset is applied here instead of in a projection
+        return ORJSONResponse([job.model_dump(include=set(job_fields)) for job in jobs])
     return jobs
-        
+
+
+class JobSearchBatch(BaseModel):
+    queries: list[JobSearchQuery] = Field(min_length=1, max_length=settings.SEARCH_BATCH_MAX_QUERIES)
+
+class JobSearchBatchResult(BaseModel):
+    query: JobSearchQuery
+    jobs: list[Job] = []
+    # set instead of jobs when the search failed upstream
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+@router.post('/search/batch')
+async def batch_search_jobs(current_user: CurrentUser, batch: JobSearchBatch) -> list[JobSearchBatchResult]:
+    """
+    Runs many searches in one request, returning the jobs of each search in the order the queries were given.
+    The searches run concurrently, so a job found by several of them is only scraped once,
+    and the job user links of all of them are written in a single bulk write.
+    """
+    semaphore = asyncio.Semaphore(settings.SEARCH_BATCH_CONCURRENCY)
+
+    async def search(q: JobSearchQuery) -> JobSearchBatchResult:
+        refresh_scheduler.record_search(**q.model_dump())
+        async with semaphore:
+            try:
+                jobs = await JobSearchService(**q.model_dump()).search()
+            except (CircuitOpenError, ScrapeTaskError, httpx.HTTPError) as e:
+                settings.logger.warning(f'batch search failed upstream - {type(e).__name__}: {e}')
+                http_error = scraper_error_to_http(e)
+                return JobSearchBatchResult(query=q, status_code=http_error.status_code, error=http_error.detail)
+        return JobSearchBatchResult(query=q, jobs=jobs)
+
+    results = await asyncio.gather(*[search(q) for q in batch.queries])
+    settings.logger.info(f'total jobs returned for {len(results)} searches: {sum(len(result.jobs) for result in results)}')
+
+    link_summary = await bulk_upsert_job_user_links(
+        [job.job_id for result in results for job in result.jobs],
+        current_user.user_id
+        )
+    settings.logger.info(f'job user links: {link_summary}')
+
+    return results
+
+
+STREAM_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
+class JobSearchStreamQuery(JobSearchQuery):
+    stream_format: Literal['ndjson', 'sse'] = 'ndjson'
+
+@router.get('/search/stream')
+async def stream_search_jobs(
+        current_user: CurrentUser,
+        q: Annotated[JobSearchStreamQuery, Query()]
+        ) -> StreamingResponse:
+    """
+    Same as /search, but streams each job as soon as it is available:
+    database results first, then every scraped job once it has been parsed and saved.
+    """
+    stream_format = q.stream_format
+    search_query = q.model_dump(exclude={'stream_format'})
+    refresh_scheduler.record_search(**search_query)
+    job_search_service = JobSearchService(**search_query)
+
+    async def stream_jobs() -> AsyncIterator[str]:
+        job_count = 0
+        try:
+            async for job in job_search_service.search_iter():
+                await bulk_upsert_job_user_links([job.job_id], current_user.user_id)
+                job_count += 1
+                job_json = job.model_dump_json(by_alias=True)
+                yield f'data: {job_json}\n\n' if stream_format == 'sse' else f'{job_json}\n'
+        except (CircuitOpenError, ScrapeTaskError, httpx.HTTPError) as e:
+            # the status line is long gone, so the error goes into the stream
+            settings.logger.warning(f'streamed search failed upstream - {type(e).__name__}: {e}')
+            http_error = scraper_error_to_http(e)
+            error_json = json.dumps({'status_code': http_error.status_code, 'detail': http_error.detail})
+            yield f'event: error\ndata: {error_json}\n\n' if stream_format == 'sse' else f'{error_json}\n'
+            return
+        settings.logger.info(f'total jobs streamed: {job_count}')
+        if stream_format == 'sse':
+            yield f'event: end\ndata: {{"count": {job_count}}}\n\n'
+
+    return StreamingResponse(stream_jobs(), media_type=STREAM_MEDIA_TYPES[stream_format])
+
 
 class JobSummary(BaseModel):
     job_id: int
-    title: str
-    company: str
+    title: Optional[str] = None
+    company: Optional[str] = None
     location: Optional[str] = None
 
+    @classmethod
+    def from_document(cls, document: dict) -> 'JobSummary':
+        # the documents are our own, validating them again would only cost time
+        return cls.model_construct(
+            job_id=document['job_id'],
+            title=document.get('title'),
+            company=document.get('company'),
+            location=document.get('location')
+            )
+
+class JobSummariesPublic(BaseModel):
+    data: list[JobSummary]
+    # pass back as cursor to get the next page, None on the last page
+    next_cursor: Optional[str] = None
+
+def encode_job_list_cursor(last_updated: datetime, link_id: uuid.UUID | Binary) -> str:
+    if isinstance(link_id, Binary):
+        link_id = link_id.as_uuid()
+    cursor = json.dumps({'last_updated': last_updated.isoformat(), 'id': str(link_id)})
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+def decode_job_list_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        decoded_cursor = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(decoded_cursor['last_updated']), uuid.UUID(decoded_cursor['id'])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail='invalid cursor')
+
 @router.get('/list')
-async def list_jobs(current_user: CurrentUser, limit: int=20) -> list[JobSummary]:
-    links = await JobUserLink.find(JobUserLink.user_id == current_user.user_id).limit(limit).to_list()
-    job_ids = [link.job_id for link in links]
-    jobs = await Job.find(In(Job.job_id, job_ids)).to_list()
-    return [
-        JobSummary(
-            job_id=job.job_id,
-            title=job.title,
-            company=job.company,
-            location=job.location
-            ) for job in jobs
+async def list_jobs(
+        current_user: CurrentUser,
+        limit: Annotated[int, Query(gt=0, le=100)] = 20,
+        cursor: Optional[str] = None
+        ) -> JobSummariesPublic:
+    """
+    List the current user's jobs, most recently linked first, one page at a time.
+    """
+    encoder = Encoder(to_db=True)
+    match = {'user_id': encoder.encode(current_user.user_id)}
+    if cursor:
+        last_updated, link_id = decode_job_list_cursor(cursor)
+        match['$or'] = [
+            {'last_updated': {'$lt': last_updated}},
+            {'last_updated': last_updated, '_id': {'$lt': encoder.encode(link_id)}},
         ]
+    with DB_QUERY_SECONDS.labels('list_jobs').time():
+        links = await JobUserLink.aggregate([
+            {'$match': match},
+            {'$sort': {'last_updated': -1, '_id': -1}},
+            # one extra link tells whether there is another page
+            {'$limit': limit + 1},
+            {'$lookup': {
+                'from': Job.get_motor_collection().name,
+                'localField': 'job_id',
+                'foreignField': 'job_id',
+                'as': 'job',
+            }},
+            {'$unwind': {'path': '$job', 'preserveNullAndEmptyArrays': True}},
+            # only the summary fields leave the server, not the whole job with its description
+            {'$project': {
+                'last_updated': 1,
+                'job.job_id': 1,
+                'job.title': 1,
+                'job.company': 1,
+                'job.location': 1,
+            }},
+        ]).to_list()
+    next_cursor = None
+    if len(links) > limit:
+        links = links[:limit]
+        next_cursor = encode_job_list_cursor(links[-1]['last_updated'], links[-1]['_id'])
+    return JobSummariesPublic.model_construct(
+        data=[JobSummary.from_document(link['job']) for link in links if 'job' in link],
+        next_cursor=next_cursor
+    )
 
 @router.get('/{job_id}')
-async def get_job_by_id(job_id: int) -> Job:
-    job = await Job.find_one({'job_id': job_id})
-    if not job:
+async def get_job_by_id(
+        job_id: int,
+        response: Response,
+        fields: Annotated[Optional[str], Query(description=JOB_FIELDS_DESCRIPTION)] = None,
+        if_none_match: Annotated[Optional[str], Header()] = None
+        ) -> Job:
+    job_fields = parse_job_fields(fields)
+    with DB_QUERY_SECONDS.labels('get_job').time():
+        document = await Job.get_motor_collection().find_one(
+            {'job_id': job_id},
+            job_projection(job_fields) if job_fields is not None else None
+        )
+    if not document:
         raise HTTPException(status_code=404, detail='job not found')
-    return job
+
+    headers = {'ETag': job_etag(job_id, document['last_updated']), 'Cache-Control': 'no-cache'}
+    if etag_matches(if_none_match, headers['ETag']):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if job_fields is not None:
+        return ORJSONResponse(sparse_job(document, job_fields), headers=headers)
+    response.headers.update(headers)
+    return Job.model_validate(document)
@@ -0,0 +1,74 @@
+import time
+
+class CircuitOpenError(Exception):
+    """raised instead of sending a request while the circuit for its host is open"""
+
+    def __init__(self, host: str, retry_after: float):
+        self.host = host
+        self.retry_after = retry_after
+        super().__init__(f'circuit open for {host}, retry in {retry_after:.1f}s')
+
+
+class CircuitBreaker:
+    """fails fast while a host keeps failing
+
+    closed: requests go through, `failure_threshold` consecutive failures open the circuit.
+    open: requests raise CircuitOpenError until `reset_seconds` (or a longer Retry-After) has passed.
+    half open: a single probe request goes through, its success closes the circuit and its failure opens it again.
+    """
+
+    def __init__(self, host: str, failure_threshold: int, reset_seconds: float):
+        if failure_threshold <= 0:
+            raise ValueError(f'failure_threshold must be > 0. value: {failure_threshold}')
+        self.host = host
+        self._failure_threshold = failure_threshold
+        self._reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_until: float | None = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_until is None:
+            return 'closed'
+        if time.monotonic() < self._opened_until or self._probing:
+            return 'open'
+        return 'half_open'
+
+    def before_request(self) -> bool:
+        """raise CircuitOpenError if the request must not be sent
+
+        Raises:
+            CircuitOpenError: raised while the circuit is open or another request is probing the host
+
+        Returns:
+            bool: True if the request is the half open probe, its outcome must be recorded
+                or the probe released with cancel_probe
+        """
+        state = self.state
+        if state == 'closed':
+            return False
+        if state == 'half_open':
+            self._probing = True
+            return True
+        retry_after = max(self._opened_until - time.monotonic(), 0.0) if not self._probing else self._reset_seconds
+        raise CircuitOpenError(self.host, retry_after)
+
+    def cancel_probe(self):
+        """let another request probe the host, for a probe that ended without an outcome"""
+        self._probing = False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_until = None
+        self._probing = False
+
+    def record_failure(self, retry_after: float | None = None):
+        self._failures += 1
+        if self._probing or self._failures >= self._failure_threshold:
+            self.trip(retry_after)
+
+    def trip(self, retry_after: float | None = None):
+        """open the circuit for reset_seconds, or for retry_after if the host asked for longer"""
+        self._opened_until = time.monotonic() + max(self._reset_seconds, retry_after or 0.0)
+        self._probing = False
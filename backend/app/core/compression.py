@@ -0,0 +1,50 @@
+import brotli
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+def _lowercase_response_headers(app: ASGIApp) -> ASGIApp:
+    """lowercase the names of the response headers app sends, as ASGI asks.
+    the responders only see a Content-Encoding header that way, and leave responses
+    apps like prometheus_client already compressed alone
+    """
+    async def app_with_lowercase_headers(scope: Scope, receive: Receive, send: Send) -> None:
+        async def send_lowercased(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                message['headers'] = [(name.lower(), value) for name, value in message.get('headers', [])]
+            await send(message)
+        await app(scope, receive, send_lowercased)
+    return app_with_lowercase_headers
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = 'br'
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int, **kwargs):
+        super().__init__(app, minimum_size, **kwargs)
+        self._compressor = brotli.Compressor(quality=quality)
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """GZipMiddleware that compresses with brotli instead when the client accepts it"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 9, brotli_quality: int = 5):
+        super().__init__(_lowercase_response_headers(app), minimum_size=minimum_size, compresslevel=compresslevel)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] == 'http' and 'br' in Headers(scope=scope).get('Accept-Encoding', ''):
+            responder = BrotliResponder(
+                self.app,
+                self.minimum_size,
+                quality=self.brotli_quality,
+                exclude_content_types=self.exclude_content_types,
+            )
+            await responder(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import secrets
 from logging import Logger
+from typing import Literal
 from app.utils import get_logger
 
 class Settings(BaseSettings):
@@ -20,6 +21,106 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
 
     MONGO_URI: str
+    # log a warning for every hot query that still runs as a collection scan
+    CHECK_QUERY_PLANS_ON_STARTUP: bool = True
+
+    # outbound scraper http client
+    # scheme and host the scrapers send requests to, point it at a stand-in server to test or benchmark
+    SCRAPER_BASE_URL: str = 'https://www.linkedin.com'
+    SCRAPER_MAX_CONNECTIONS: int = 20
+    SCRAPER_MAX_CONNECTIONS_PER_HOST: int = 10
+    SCRAPER_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    SCRAPER_KEEPALIVE_EXPIRY: float = 30.0
+    SCRAPER_CONNECT_TIMEOUT: float = 5.0
+    SCRAPER_READ_TIMEOUT: float = 15.0
+    SCRAPER_POOL_TIMEOUT: float = 30.0
+    # max scraper requests waiting on a response at once, across all hosts
+    SCRAPER_MAX_IN_FLIGHT: int = 10
+    # requests per second allowed to a single host, with bursts of up to SCRAPER_RATE_LIMIT_BURST
+    SCRAPER_RATE_LIMIT_PER_HOST: float = 5.0
+    SCRAPER_RATE_LIMIT_BURST: int = 5
+    # the per host rate adapts between these bounds, growing by SCRAPER_RATE_LIMIT_INCREASE per successful
+    # response and multiplied by SCRAPER_RATE_LIMIT_DECREASE_FACTOR per throttled (429/503) response
+    SCRAPER_RATE_LIMIT_MIN_PER_HOST: float = 0.5
+    SCRAPER_RATE_LIMIT_MAX_PER_HOST: float = 10.0
+    SCRAPER_RATE_LIMIT_INCREASE: float = 0.1
+    SCRAPER_RATE_LIMIT_DECREASE_FACTOR: float = 0.5
+    # retries of throttled, 5xx and failed requests, with jittered exponential backoff or the host's Retry-After
+    SCRAPER_MAX_RETRIES: int = 3
+    SCRAPER_RETRY_BACKOFF_BASE: float = 0.5
+    # a Retry-After longer than this isn't waited out, the circuit for the host opens instead
+    SCRAPER_RETRY_BACKOFF_MAX: float = 30.0
+    # consecutive failed requests to a host that open its circuit, failing requests fast for SCRAPER_CIRCUIT_RESET_SECONDS
+    SCRAPER_CIRCUIT_FAILURE_THRESHOLD: int = 5
+    SCRAPER_CIRCUIT_RESET_SECONDS: float = 60.0
+    # html parser backend used by the scrapers, see app.services.parsers.PARSERS
+    SCRAPER_PARSER: Literal['bs4', 'lxml'] = 'lxml'
+
+    # where pages are scraped: in the api process, or by the scrape workers (worker.py) through a task queue in mongo
+    SCRAPE_MODE: Literal['inline', 'queue'] = 'inline'
+    # how long a search waits for its queued scrape tasks, and how often it checks on them
+    SCRAPE_QUEUE_WAIT_TIMEOUT_SECONDS: float = 60.0
+    SCRAPE_QUEUE_POLL_INTERVAL_SECONDS: float = 0.25
+    SCRAPE_QUEUE_MAX_ATTEMPTS: int = 3
+    SCRAPE_QUEUE_RETRY_BACKOFF_SECONDS: float = 5.0
+    # a worker that hasn't finished a task within its lease is presumed dead, the task goes back to the queue
+    SCRAPE_QUEUE_LEASE_SECONDS: float = 120.0
+    # finished tasks are kept this long, dead ones longer so they can be inspected
+    SCRAPE_QUEUE_DONE_TTL_SECONDS: float = 60 * 60
+    SCRAPE_QUEUE_DEAD_TTL_SECONDS: float = 7 * 24 * 60 * 60
+    # tasks each worker process works on at once
+    SCRAPE_WORKER_CONCURRENCY: int = 10
+
+    # jobs in a listing that were stored or updated more recently than this are taken from the db
+    # instead of scraping their detail page again
+    SCRAPE_JOB_FRESH_SECONDS: float = 6 * 60 * 60
+
+    # on-disk cache of raw job detail pages and their parsed content
+    PAGE_CACHE_ENABLED: bool = True
+    PAGE_CACHE_DIR: str = '.page_cache'
+    PAGE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    # cached pages younger than this are used without asking LinkedIn, older ones are revalidated
+    PAGE_CACHE_FRESH_SECONDS: float = 60 * 60
+
+    # pool that html parsing and password hashing run on, off the event loop
+    WORKER_POOL_KIND: Literal['thread', 'process'] = 'thread'
+    WORKER_POOL_MAX_WORKERS: int = 4
+
+    # background refresh of popular searches
+    REFRESH_ENABLED: bool = True
+    REFRESH_INTERVAL_SECONDS: float = 600.0
+    # jobs last updated longer ago than this are re-scraped
+    REFRESH_STALE_AFTER_SECONDS: float = 6 * 60 * 60
+    REFRESH_TOP_QUERIES: int = 20
+    # searches refreshed at once
+    REFRESH_CONCURRENCY: int = 2
+    # max stale jobs re-scraped per search and refresh
+    REFRESH_BATCH_SIZE: int = 50
+    REFRESH_SHUTDOWN_TIMEOUT_SECONDS: float = 10.0
+
+    # in-process cache of authenticated users
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_MAX_ENTRIES: int = 10000
+
+    # in-memory full-text index over scraped jobs, searched before scraping
+    SEARCH_INDEX_ENABLED: bool = True
+
+    # in-process cache of search results
+    SEARCH_CACHE_TTL_SECONDS: float = 300.0
+    SEARCH_CACHE_MAX_ENTRIES: int = 1024
+
+    # listing pages scraped this recently aren't fetched again, later scrapes of the listing continue after them,
+    # and a search whose listing was scraped this recently, deep enough, is answered from the db alone
+    SEARCH_KEY_FRESH_SECONDS: float = 30 * 60
+
+    # max searches in one batch search request, and how many of them run at once
+    SEARCH_BATCH_MAX_QUERIES: int = 50
+    SEARCH_BATCH_CONCURRENCY: int = 10
+
+    # responses at least this large are compressed, with brotli if the client accepts it, else gzip
+    RESPONSE_COMPRESSION_MIN_BYTES: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_BROTLI_QUALITY: int = 5
 
 
 settings = Settings()
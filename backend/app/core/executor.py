@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+import functools
+import time
+from typing import Any, Callable, Literal, TypeVar
+from app.core.config import settings
+from app.core.metrics import WORKER_POOL_RUN_SECONDS, WORKER_POOL_WAIT_SECONDS, track_worker_pool
+
+T = TypeVar('T')
+
+@dataclass
+class WorkerPoolStats:
+    in_flight: int = 0
+    queue_depth: int = 0
+    completed: int = 0
+    failed: int = 0
+    # seconds spent waiting for a free worker / running on one, summed over all calls
+    wait_seconds_total: float = 0.0
+    run_seconds_total: float = 0.0
+    max_wait_seconds: float = 0.0
+    max_run_seconds: float = 0.0
+
+
+def _timed_call(fn: Callable[..., T], args: tuple, kwargs: dict) -> tuple[T, float, float]:
+    # wall clock time so it can be compared across processes
+    started_at = time.time()
+    result = fn(*args, **kwargs)
+    return result, started_at, time.time() - started_at
+
+
+class WorkerPool:
+    """thread or process pool that CPU-bound work is sent to so it doesn't block the event loop"""
+
+    def __init__(self, kind: Literal['thread', 'process'], max_workers: int):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f'kind must be "thread" or "process". value: {kind}')
+        if max_workers <= 0:
+            raise ValueError(f'max_workers must be > 0. value: {max_workers}')
+        self._kind = kind
+        self._max_workers = max_workers
+        self._executor: Executor | None = None
+        self._stats = WorkerPoolStats()
+
+    def start(self):
+        if self._executor is None:
+            executor_class = ThreadPoolExecutor if self._kind == 'thread' else ProcessPoolExecutor
+            self._executor = executor_class(max_workers=self._max_workers)
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """run fn(*args, **kwargs) on the pool and wait for its result
+
+        With a process pool, fn, its arguments and its result must be picklable.
+        """
+        # started lazily so scripts that never run the app lifespan can still use the pool
+        self.start()
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+        self._stats.in_flight += 1
+        try:
+            result, started_at, run_seconds = await loop.run_in_executor(
+                self._executor, functools.partial(_timed_call, fn, args, kwargs)
+            )
+        except Exception:
+            self._stats.failed += 1
+            raise
+        finally:
+            self._stats.in_flight -= 1
+        wait_seconds = max(0.0, started_at - submitted_at)
+        self._stats.completed += 1
+        self._stats.wait_seconds_total += wait_seconds
+        self._stats.run_seconds_total += run_seconds
+        self._stats.max_wait_seconds = max(self._stats.max_wait_seconds, wait_seconds)
+        self._stats.max_run_seconds = max(self._stats.max_run_seconds, run_seconds)
+        task = getattr(fn, '__name__', type(fn).__name__)
+        WORKER_POOL_WAIT_SECONDS.labels(task).observe(wait_seconds)
+        WORKER_POOL_RUN_SECONDS.labels(task).observe(run_seconds)
+        return result
+
+    @property
+    def stats(self) -> WorkerPoolStats:
+        # every call beyond max_workers is sitting in the executor's queue
+        self._stats.queue_depth = max(0, self._stats.in_flight - self._max_workers)
+        return self._stats
+
+
+worker_pool = WorkerPool(kind=settings.WORKER_POOL_KIND, max_workers=settings.WORKER_POOL_MAX_WORKERS)
+track_worker_pool('default', worker_pool)
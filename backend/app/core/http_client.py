@@ -0,0 +1,198 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import httpx
+from app.core.config import settings
+from app.core.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.core.metrics import SCRAPER_REJECTED, SCRAPER_RETRIES
+from app.core.rate_limit import HostRateLimiter
+
+# responses worth retrying, the throttling ones also slow down the rate for their host
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUS_CODES = frozenset({429, 503})
+
+def retry_after_seconds(resp: httpx.Response) -> float | None:
+    """seconds to wait according to the Retry-After header, either delay-seconds or an http date"""
+    value = resp.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(tz=timezone.utc)).total_seconds(), 0.0)
+
+
+class ScraperClient:
+    """shared, pooled keep-alive http client for all outbound scraper traffic"""
+
+    def __init__(
+            self,
+            client: httpx.AsyncClient,
+            max_connections_per_host: int,
+            max_in_flight: int,
+            rate_limiter: HostRateLimiter | None = None,
+            max_retries: int = 0,
+            backoff_base: float = 0.5,
+            backoff_max: float = 30.0,
+            circuit_failure_threshold: int | None = None,
+            circuit_reset_seconds: float = 60.0
+            ):
+        self._client = client
+        self._max_connections_per_host = max_connections_per_host
+        self._host_slots: dict[str, asyncio.Semaphore] = {}
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._rate_limiter = rate_limiter
+        self._max_retries = max_retries
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+        self._circuit_failure_threshold = circuit_failure_threshold
+        self._circuit_reset_seconds = circuit_reset_seconds
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def _slots_for(self, host: str) -> asyncio.Semaphore:
+        slots = self._host_slots.get(host)
+        if slots is None:
+            slots = self._host_slots[host] = asyncio.Semaphore(self._max_connections_per_host)
+        return slots
+
+    def breaker_for(self, host: str) -> CircuitBreaker | None:
+        if self._circuit_failure_threshold is None:
+            return None
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                host,
+                failure_threshold=self._circuit_failure_threshold,
+                reset_seconds=self._circuit_reset_seconds
+            )
+        return breaker
+
+    def _backoff(self, attempt: int, retry_after: float | None) -> float:
+        # full jitter keeps retries of requests that failed together from arriving together
+        backoff = random.uniform(0, min(self._backoff_max, self._backoff_base * 2 ** attempt))
+        return max(backoff, retry_after or 0.0)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """send a GET request, waiting for a free in-flight slot, a free connection slot
+        on the target host and, if rate limited, a token for the target host.
+        throttled, 5xx and failed requests are retried with backoff, honoring Retry-After
+
+        Args:
+            url (str): url to request
+
+        Raises:
+            CircuitOpenError: raised without sending the request while the circuit for the target host is open
+            TransportError: raised when the last attempt could not get a response
+
+        Returns:
+            httpx.Response: the response, the last one if every attempt was throttled or failed
+        """
+        host = urlsplit(url).netloc
+        breaker = self.breaker_for(host)
+        for attempt in range(self._max_retries + 1):
+            try:
+                probing = breaker.before_request() if breaker else False
+            except CircuitOpenError:
+                SCRAPER_REJECTED.labels(host).inc()
+                raise
+            try:
+                async with self._in_flight, self._slots_for(host):
+                    if self._rate_limiter is not None:
+                        await self._rate_limiter.acquire(host)
+                    resp = await self._client.get(url, **kwargs)
+            except httpx.TransportError as e:
+                if breaker:
+                    breaker.record_failure()
+                if attempt == self._max_retries:
+                    raise
+                retry_after = None
+                reason = type(e).__name__
+            except BaseException:
+                if probing:
+                    breaker.cancel_probe()
+                raise
+            else:
+                if resp.status_code not in RETRY_STATUS_CODES:
+                    if breaker:
+                        breaker.record_success()
+                    if self._rate_limiter is not None:
+                        self._rate_limiter.on_success(host)
+                    return resp
+                retry_after = retry_after_seconds(resp)
+                if self._rate_limiter is not None and resp.status_code in THROTTLE_STATUS_CODES:
+                    self._rate_limiter.on_throttled(host)
+                if breaker:
+                    breaker.record_failure(retry_after)
+                    if retry_after is not None and retry_after > self._backoff_max:
+                        # the host wants us gone for longer than we are willing to wait, fail fast until then
+                        breaker.trip(retry_after)
+                        return resp
+                if attempt == self._max_retries:
+                    return resp
+                reason = str(resp.status_code)
+            SCRAPER_RETRIES.labels(reason).inc()
+            await asyncio.sleep(self._backoff(attempt, retry_after))
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_scraper_client: ScraperClient | None = None
+
+def create_scraper_client() -> ScraperClient:
+    limits = httpx.Limits(
+        max_connections=settings.SCRAPER_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.SCRAPER_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.SCRAPER_KEEPALIVE_EXPIRY,
+    )
+    timeout = httpx.Timeout(
+        settings.SCRAPER_READ_TIMEOUT,
+        connect=settings.SCRAPER_CONNECT_TIMEOUT,
+        pool=settings.SCRAPER_POOL_TIMEOUT,
+    )
+    client = httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True)
+    rate_limiter = HostRateLimiter(
+        rate=settings.SCRAPER_RATE_LIMIT_PER_HOST,
+        burst=settings.SCRAPER_RATE_LIMIT_BURST,
+        min_rate=settings.SCRAPER_RATE_LIMIT_MIN_PER_HOST,
+        max_rate=settings.SCRAPER_RATE_LIMIT_MAX_PER_HOST,
+        increase=settings.SCRAPER_RATE_LIMIT_INCREASE,
+        decrease_factor=settings.SCRAPER_RATE_LIMIT_DECREASE_FACTOR,
+    )
+    return ScraperClient(
+        client,
+        max_connections_per_host=settings.SCRAPER_MAX_CONNECTIONS_PER_HOST,
+        max_in_flight=settings.SCRAPER_MAX_IN_FLIGHT,
+        rate_limiter=rate_limiter,
+        max_retries=settings.SCRAPER_MAX_RETRIES,
+        backoff_base=settings.SCRAPER_RETRY_BACKOFF_BASE,
+        backoff_max=settings.SCRAPER_RETRY_BACKOFF_MAX,
+        circuit_failure_threshold=settings.SCRAPER_CIRCUIT_FAILURE_THRESHOLD,
+        circuit_reset_seconds=settings.SCRAPER_CIRCUIT_RESET_SECONDS,
+    )
+
+async def start_scraper_client() -> ScraperClient:
+    global _scraper_client
+    if _scraper_client is None:
+        _scraper_client = create_scraper_client()
+    return _scraper_client
+
+async def close_scraper_client():
+    global _scraper_client
+    if _scraper_client is not None:
+        await _scraper_client.aclose()
+        _scraper_client = None
+
+def get_scraper_client() -> ScraperClient:
+    if _scraper_client is None:
+        raise RuntimeError('scraper http client has not been started, call start_scraper_client() first')
+    return _scraper_client
@@ -0,0 +1,95 @@
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+DB_QUERY_SECONDS = Histogram(
+    'job_app_db_query_seconds',
+    'Time spent on a database round-trip',
+    ['operation'],
+)
+SCRAPE_SECONDS = Histogram(
+    'job_app_scrape_seconds',
+    'Time to fetch and parse one scraped page',
+    ['page'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+SEARCH_SECONDS = Histogram(
+    'job_app_search_seconds',
+    'Time to answer a job search',
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+SEARCH_RESULTS = Counter(
+    'job_app_search_results',
+    'Jobs returned by searches, by where they came from',
+    ['source'],
+)
+SCRAPER_RETRIES = Counter(
+    'job_app_scraper_retries',
+    'Scraper requests retried, by status code or transport error',
+    ['reason'],
+)
+SCRAPER_REJECTED = Counter(
+    'job_app_scraper_rejected',
+    'Scraper requests failed fast because the circuit for their host was open',
+    ['host'],
+)
+PAGE_CACHE_LOOKUPS = Counter(
+    'job_app_page_cache_lookups',
+    'Job detail page lookups, by how the cached page was used',
+    ['result'],
+)
+# parse time is the run time of the parse_listing and parse_job tasks
+WORKER_POOL_WAIT_SECONDS = Histogram(
+    'job_app_worker_pool_wait_seconds',
+    'Time a task waited for a free worker',
+    ['task'],
+)
+WORKER_POOL_RUN_SECONDS = Histogram(
+    'job_app_worker_pool_run_seconds',
+    'Time a task ran on a worker',
+    ['task'],
+)
+
+
+class StatsCollector:
+    """exposes the stats objects of caches and worker pools at scrape time"""
+
+    def __init__(self):
+        self.caches: dict[str, object] = {}
+        self.worker_pools: dict[str, object] = {}
+
+    def collect(self):
+        cache_metrics = {
+            'hits': CounterMetricFamily('job_app_cache_hits', 'Cache lookups that found an entry', labels=['cache']),
+            'misses': CounterMetricFamily('job_app_cache_misses', 'Cache lookups that found nothing', labels=['cache']),
+            'evictions': CounterMetricFamily('job_app_cache_evictions', 'Entries evicted to stay within size', labels=['cache']),
+            'invalidations': CounterMetricFamily('job_app_cache_invalidations', 'Entries invalidated', labels=['cache']),
+            'size': GaugeMetricFamily('job_app_cache_size', 'Entries in the cache', labels=['cache']),
+        }
+        for name, cache in self.caches.items():
+            stats = cache.stats
+            for stat, metric in cache_metrics.items():
+                metric.add_metric([name], getattr(stats, stat))
+        yield from cache_metrics.values()
+
+        pool_metrics = {
+            'in_flight': GaugeMetricFamily('job_app_worker_pool_in_flight', 'Tasks submitted and not finished', labels=['pool']),
+            'queue_depth': GaugeMetricFamily('job_app_worker_pool_queue_depth', 'Tasks waiting for a free worker', labels=['pool']),
+            'failed': CounterMetricFamily('job_app_worker_pool_failed', 'Tasks that raised', labels=['pool']),
+        }
+        for name, pool in self.worker_pools.items():
+            stats = pool.stats
+            for stat, metric in pool_metrics.items():
+                metric.add_metric([name], getattr(stats, stat))
+        yield from pool_metrics.values()
+
+
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+def track_cache(name: str, cache: object):
+    """export the stats of a cache, anything with a CacheStats `stats` attribute"""
+    stats_collector.caches[name] = cache
+
+def track_worker_pool(name: str, worker_pool: object):
+    """export the stats of a worker pool, anything with a WorkerPoolStats `stats` attribute"""
+    stats_collector.worker_pools[name] = worker_pool
@@ -0,0 +1,42 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.models.jobs import Job
+from app.core.config import settings
+
+async def _has_unique_job_id_index(collection) -> bool:
+    indexes = await collection.index_information()
+    return any(index.get('unique') and index['key'] == [('job_id', 1)] for index in indexes.values())
+
+async def remove_duplicate_job_ids(database: AsyncIOMotorDatabase) -> int:
+    """keep only the most recently updated document of every job_id stored more than once,
+    merging the search_keys of the others into it.
+    the old upsert-by-query could store a job twice under concurrency, and init_beanie fails to build
+    the unique job_id index over such a collection, so this runs before it
+
+    Returns:
+        int: number of duplicate documents deleted
+    """
+    # beanie names collections after their document class
+    collection = database[Job.__name__]
+    if await _has_unique_job_id_index(collection):
+        return 0
+    duplicates = await collection.aggregate([
+        {'$sort': {'last_updated': -1}},
+        {'$group': {
+            '_id': '$job_id',
+            'document_ids': {'$push': '$_id'},
+            'search_keys': {'$push': '$search_keys'},
+        }},
+        {'$match': {'document_ids.1': {'$exists': True}}},
+    ], allowDiskUse=True).to_list(length=None)
+    deleted = 0
+    for duplicate in duplicates:
+        kept_id, *duplicate_ids = duplicate['document_ids']
+        search_keys = list(dict.fromkeys(
+            search_key for document_search_keys in duplicate['search_keys'] for search_key in document_search_keys or []
+            ))
+        await collection.update_one({'_id': kept_id}, {'$addToSet': {'search_keys': {'$each': search_keys}}})
+        result = await collection.delete_many({'_id': {'$in': duplicate_ids}})
+        deleted += result.deleted_count
+    if deleted:
+        settings.logger.warning(f'{deleted} duplicate job documents of {len(duplicates)} job ids removed')
+    return deleted
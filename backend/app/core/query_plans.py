@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+import uuid
+from beanie import Document
+from beanie.operators import In
+from app.models.jobs import Job
+from app.models.links import JobUserLink
+from app.models.scrape_tasks import ScrapeTask, ScrapeTaskStatus
+from app.models.users import User
+from app.core.config import settings
+
+def _representative_queries() -> list[tuple[str, type[Document], dict]]:
+    """the filters the api runs on every request, built with placeholder values"""
+    placeholder_user_id = uuid.uuid4()
+    return [
+        ('job search', Job, Job.find(Job.search_keys == '', Job.date_posted >= datetime.now(tz=timezone.utc)).get_filter_query()),
+        ('job upsert', Job, Job.find(Job.job_id == 0).get_filter_query()),
+        ('job list', Job, Job.find(In(Job.job_id, [0])).get_filter_query()),
+        ('links by user', JobUserLink, JobUserLink.find(JobUserLink.user_id == placeholder_user_id).get_filter_query()),
+        ('current user', User, User.find(User.user_id == placeholder_user_id).get_filter_query()),
+        ('login', User, User.find(User.username == '').get_filter_query()),
+        ('scrape task claim', ScrapeTask, ScrapeTask.find(
+            ScrapeTask.status == ScrapeTaskStatus.PENDING,
+            ScrapeTask.available_at <= datetime.now(tz=timezone.utc)
+            ).get_filter_query()),
+    ]
+
+def _plan_stages(plan: dict) -> list[str]:
+    stages = [plan['stage']] if 'stage' in plan else []
+    for child_key in ('inputStage', 'queryPlan'):
+        if child_key in plan:
+            stages.extend(_plan_stages(plan[child_key]))
+    for child in plan.get('inputStages', []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+async def log_collection_scans():
+    """explain the api's hot queries and log every one whose winning plan is a collection scan"""
+    for name, document_model, filter_query in _representative_queries():
+        try:
+            explanation = await document_model.get_motor_collection().find(filter_query).explain()
+        except Exception as e:
+            settings.logger.warning(f'could not explain the "{name}" query: {e}')
+            continue
+        winning_plan = explanation.get('queryPlanner', {}).get('winningPlan', {})
+        if 'COLLSCAN' in _plan_stages(winning_plan):
+            settings.logger.warning(
+                f'the "{name}" query on {document_model.__name__} is a collection scan: {filter_query}'
+            )
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+class TokenBucket:
+    """token bucket allowing `rate` requests per second with bursts of up to `burst` requests"""
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0:
+            raise ValueError(f'rate must be > 0. value: {rate}')
+        if burst <= 0:
+            raise ValueError(f'burst must be > 0. value: {burst}')
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    def set_rate(self, rate: float):
+        self._refill()
+        self._rate = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """wait until a token is available and take it"""
+        # the lock makes waiters queue up in order instead of racing for the next token
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class HostRateLimiter:
+    """one token bucket per host, with each host's rate adapted by additive increase / multiplicative decrease:
+    every successful response raises the rate by `increase`, up to `max_rate`,
+    and every throttled response multiplies it by `decrease_factor`, down to `min_rate`
+    """
+
+    def __init__(
+            self,
+            rate: float,
+            burst: int,
+            min_rate: float | None = None,
+            max_rate: float | None = None,
+            increase: float = 0.0,
+            decrease_factor: float = 1.0
+            ):
+        if not 0 < decrease_factor <= 1:
+            raise ValueError(f'decrease_factor must be > 0 and <= 1. value: {decrease_factor}')
+        self._rate = rate
+        self._burst = burst
+        self._min_rate = min(rate, min_rate or rate)
+        self._max_rate = max(rate, max_rate or rate)
+        self._increase = increase
+        self._decrease_factor = decrease_factor
+        self._buckets: dict[str, TokenBucket] = {}
+        self._decreased_at: dict[str, float] = {}
+
+    def bucket_for(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self._rate, self._burst)
+        return bucket
+
+    def rate_for(self, host: str) -> float:
+        return self.bucket_for(host).rate
+
+    async def acquire(self, host: str):
+        await self.bucket_for(host).acquire()
+
+    def on_success(self, host: str):
+        bucket = self.bucket_for(host)
+        if bucket.rate < self._max_rate:
+            bucket.set_rate(min(self._max_rate, bucket.rate + self._increase))
+
+    def on_throttled(self, host: str):
+        bucket = self.bucket_for(host)
+        now = time.monotonic()
+        # requests already in flight when the host started throttling come back throttled together,
+        # back off once for all of them rather than once per response
+        if now - self._decreased_at.get(host, float('-inf')) < 1 / bucket.rate:
+            return
+        self._decreased_at[host] = now
+        bucket.set_rate(max(self._min_rate, bucket.rate * self._decrease_factor))
@@ -0,0 +1,22 @@
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse
+
+class ORJSONResponse(JSONResponse):
+    """json response serialized by orjson, for content that isn't a pydantic model
+    (FastAPI already serializes return types through pydantic, and deprecated its own ORJSONResponse).
+    datetimes are utc, naive ones as read from mongo included
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """whether an If-None-Match header matches etag, compared weakly as conditional GETs are"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque_tag = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque_tag for tag in if_none_match.split(','))
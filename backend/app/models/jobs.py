@@ -1,5 +1,6 @@
 from pydantic import BaseModel, ConfigDict, computed_field, Field
-from beanie import Document
+from beanie import Document, Indexed
+from pymongo import IndexModel, ASCENDING, DESCENDING
 from enum import Enum
 from typing import Optional
 from datetime import datetime, timezone
@@ -30,7 +31,7 @@ class JobStatus(str, Enum):
     CLOSED = 'Closed'
 
 class Job(Document):
-    job_id: int
+    job_id: Indexed(int, unique=True) # type: ignore[reportInvalidTypeForm]
     title: Optional[str] = None
     company: Optional[str] = None
     location: Optional[str] = None
@@ -44,8 +45,18 @@ class Job(Document):
     search_keys: list[str]
     last_updated: datetime = datetime.now(tz=timezone.utc)
 
+    class Settings:
+        indexes = [
+            # JobSearchService._search_db filters on search_keys and date_posted
+            IndexModel([('search_keys', ASCENDING), ('date_posted', DESCENDING)]),
+        ]
+
     @computed_field
     @property
     def job_link(self) -> str:
-        return f'https://www.linkedin.com/jobs/view/{self.job_id}'
+        return self.link_for(self.job_id)
+
+    @staticmethod
+    def link_for(job_id: int) -> str:
+        return f'https://www.linkedin.com/jobs/view/{job_id}'
     
\ No newline at end of file
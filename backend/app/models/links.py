@@ -1,10 +1,22 @@
 from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
 import uuid
 from datetime import datetime, timezone
 
+JOB_USER_NAMESPACE = uuid.UUID('f27dcd16-431c-11f0-93a8-02b932676a17')
+
+def make_job_user_link_id(job_id: int, user_id: uuid.UUID) -> uuid.UUID:
+    return uuid.uuid5(JOB_USER_NAMESPACE, f"{job_id}:{user_id}")
+
 class JobUserLink(Document):
     id: uuid.UUID
     job_id: int
     user_id: uuid.UUID
-    last_updated: datetime = datetime.now(tz=timezone.utc)
-    
\ No newline at end of file
+    last_updated: datetime = Field(default_factory=lambda: datetime.now(tz=timezone.utc))
+
+    class Settings:
+        indexes = [
+            # a user's links, newest first, is both the lookup and the pagination order of /jobs/list
+            IndexModel([('user_id', ASCENDING), ('last_updated', DESCENDING), ('_id', DESCENDING)]),
+        ]
@@ -0,0 +1,50 @@
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from enum import Enum
+from typing import Any, Optional
+from datetime import datetime, timezone
+
+class ScrapeTaskKind(str, Enum):
+    LISTING = 'listing'
+    JOB = 'job'
+
+class ScrapeTaskStatus(str, Enum):
+    PENDING = 'pending'
+    LEASED = 'leased'
+    DONE = 'done'
+    # failed max_attempts times, or with an error retrying can't fix
+    DEAD = 'dead'
+
+class ScrapeTask(Document):
+    """a listing or job page to scrape, queued for the scrape workers"""
+    kind: ScrapeTaskKind
+    # keyword arguments of JobPostScraper.get_listing_pages for listings, the job_id for jobs
+    params: dict[str, Any]
+    # identical tasks share a key, a task is only queued once while one with its key is active
+    key: str
+    status: ScrapeTaskStatus = ScrapeTaskStatus.PENDING
+    # the key while the task is pending or leased, unset once it has finished
+    active_key: Optional[str] = None
+    attempts: int = 0
+    max_attempts: int = 3
+    # pending tasks aren't claimed before this, retries back off through it
+    available_at: datetime = Field(default_factory=lambda: datetime.now(tz=timezone.utc))
+    lease_owner: Optional[str] = None
+    lease_expires_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(tz=timezone.utc))
+    # finished tasks are deleted by mongo once this has passed
+    expire_at: Optional[datetime] = None
+
+    class Settings:
+        indexes = [
+            # claiming takes the pending task that has been available the longest
+            IndexModel([('status', ASCENDING), ('available_at', ASCENDING)]),
+            # only one task per key is queued at a time, even when api processes enqueue it at once
+            IndexModel([('active_key', ASCENDING)], unique=True, sparse=True),
+            # expired leases are found and returned to the queue
+            IndexModel([('status', ASCENDING), ('lease_expires_at', ASCENDING)]),
+            IndexModel([('expire_at', ASCENDING)], expireAfterSeconds=0),
+        ]
@@ -0,0 +1,108 @@
+from beanie import Document, Indexed
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING
+from typing import Optional
+from datetime import datetime, timedelta, timezone
+
+def _is_recent(fetched_at: datetime | None, fresh_after: timedelta) -> bool:
+    if fetched_at is None:
+        return False
+    if fetched_at.tzinfo is None:
+        fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+    return datetime.now(tz=timezone.utc) - fetched_at < fresh_after
+
+class SearchKey(Document):
+    """what has been scraped and searched for one search key, see JobSearchService.search_key"""
+    key: Indexed(str, unique=True) # type: ignore[reportInvalidTypeForm]
+    last_scraped_at: Optional[datetime] = None
+    # max_days_since_posted of the listing scraped, how many of its pages have been scraped
+    # and whether the listing ran out before the last page requested
+    scraped_max_days_since_posted: Optional[int] = None
+    pages_scraped: int = 0
+    listing_exhausted: bool = False
+    search_count: int = 0
+    # searches answered from the db without scraping
+    db_hit_count: int = 0
+    scrape_count: int = 0
+
+    def is_fresh(self, fresh_after: timedelta) -> bool:
+        return _is_recent(self.last_scraped_at, fresh_after)
+
+    def covers(self, max_days_since_posted: int, start: int, limit: int, page_size: int, fresh_after: timedelta) -> bool:
+        """whether a recent scrape already stored every job the search could return,
+        so the db alone can answer it
+
+        Args:
+            max_days_since_posted (int): max_days_since_posted of the search
+            start (int): offset of the first job of the search
+            limit (int): number of jobs the search returns
+            page_size (int): jobs per listing page
+            fresh_after (timedelta): scrapes older than this don't count
+
+        Returns:
+            bool: True if the search doesn't need to scrape
+        """
+        if not self.is_fresh(fresh_after):
+            return False
+        # a listing that ran out holds every job of any listing with a shorter posting window
+        if self.listing_exhausted and self.scraped_max_days_since_posted >= max_days_since_posted:
+            return True
+        return (
+            self.scraped_max_days_since_posted == max_days_since_posted
+            and self.pages_scraped * page_size >= start + limit
+        )
+
+
+class ScrapeFrontier(Document):
+    """listing pages of one search key and posting window that have been fetched, and when"""
+    search_key: str
+    max_days_since_posted: int
+    # listing page offset -> when it was last fetched
+    fetched_pages: dict[str, datetime] = Field(default_factory=dict)
+    # listing page offset -> how many postings it held, pages can hold fewer than the page size
+    page_postings: dict[str, int] = Field(default_factory=dict)
+    # offset of the first page found empty, the listing ended before it when it was fetched
+    end_offset: Optional[int] = None
+    end_fetched_at: Optional[datetime] = None
+
+    class Settings:
+        indexes = [
+            IndexModel([('search_key', ASCENDING), ('max_days_since_posted', ASCENDING)], unique=True),
+        ]
+
+    def next_offset(self, start: int, page_size: int, fresh_after: timedelta) -> int | None:
+        """offset of the first page from start on that hasn't been fetched recently
+
+        Args:
+            start (int): offset the scrape would start at without the frontier
+            page_size (int): postings per listing page
+            fresh_after (timedelta): pages fetched longer ago than this are fetched again
+
+        Returns:
+            int | None: offset to continue the scrape at, None if the listing recently ended before it
+        """
+        offset = start - start % page_size
+        while _is_recent(self.fetched_pages.get(str(offset)), fresh_after):
+            offset += page_size
+        if self.end_offset is not None and offset >= self.end_offset and _is_recent(self.end_fetched_at, fresh_after):
+            return None
+        return offset
+
+    def stored_through(self, stored_jobs: int, end: int, page_size: int) -> int:
+        """offset of the first page before end whose postings stored_jobs can't all account for,
+        counting the postings of the pages from the start of the listing
+
+        Args:
+            stored_jobs (int): jobs of the listing in the db
+            end (int): offset of the first page not to check
+            page_size (int): postings per full listing page, assumed for pages not counted
+
+        Returns:
+            int: offset of the first page with jobs missing from the db, end if none are
+        """
+        listed_jobs = 0
+        for offset in range(0, end, page_size):
+            listed_jobs += self.page_postings.get(str(offset), page_size)
+            if listed_jobs > stored_jobs:
+                return offset
+        return end
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from beanie import Document, Indexed
+from typing import Annotated
 import uuid
 
 class UserBase(BaseModel):
@@ -10,7 +11,7 @@ class UserCreate(UserBase):
     password: str = Field(min_length=8, max_length=40)
 
 class User(UserBase, Document):
-    user_id: uuid.UUID = Field(default_factory=uuid.uuid4)
+    user_id: Annotated[uuid.UUID, Indexed(unique=True)] = Field(default_factory=uuid.uuid4)
     hashed_password: str
 
 # Properties to return via API, id is always required
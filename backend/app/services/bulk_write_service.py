@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import uuid
+from beanie.odm.utils.encoder import Encoder
+from pymongo import UpdateOne
+from pymongo.results import BulkWriteResult
+from app.models.jobs import Job
+from app.models.links import JobUserLink, make_job_user_link_id
+from app.services.search_index import job_search_index
+from app.core.config import settings
+from app.core.metrics import DB_QUERY_SECONDS
+
+# fields refreshed on every upsert, search_keys only grows and everything else is only written when the job is first inserted
+JOB_UPDATE_FIELDS = ('last_updated', 'date_posted', 'num_applicants')
+
+@dataclass
+class BulkWriteSummary:
+    inserted: int = 0
+    modified: int = 0
+    unchanged: int = 0
+
+    @classmethod
+    def from_result(cls, result: BulkWriteResult) -> 'BulkWriteSummary':
+        return cls(
+            inserted=result.upserted_count,
+            modified=result.modified_count,
+            unchanged=result.matched_count - result.modified_count,
+        )
+
+    def __str__(self) -> str:
+        return f'{self.inserted} inserted, {self.modified} modified, {self.unchanged} unchanged'
+
+
+def _job_upsert(job: Job, now: datetime) -> UpdateOne:
+    document = Encoder(to_db=True).encode(job)
+    for field in ('_id', 'revision_id', 'search_keys', *JOB_UPDATE_FIELDS):
+        document.pop(field, None)
+    return UpdateOne(
+        {'job_id': job.job_id},
+        {
+            '$set': {
+                'last_updated': now,
+                'date_posted': job.date_posted,
+                'num_applicants': job.num_applicants,
+            },
+            # a job found again by another search joins that search too
+            '$addToSet': {'search_keys': {'$each': job.search_keys}},
+            '$setOnInsert': document,
+        },
+        upsert=True,
+    )
+
+async def bulk_upsert_jobs(jobs: list[Job]) -> BulkWriteSummary:
+    """upsert many jobs in a single unordered bulk write
+
+    Args:
+        jobs (list[Job]): jobs to upsert, matched on job_id
+
+    Returns:
+        BulkWriteSummary: how many jobs were inserted, modified and left unchanged
+    """
+    now = datetime.now(tz=timezone.utc)
+    # two upserts for the same job_id in one unordered batch would race on the unique index
+    unique_jobs = {job.job_id: job for job in jobs}
+    if not unique_jobs:
+        return BulkWriteSummary()
+    with DB_QUERY_SECONDS.labels('upsert_jobs').time():
+        result = await Job.get_motor_collection().bulk_write(
+            [_job_upsert(job, now) for job in unique_jobs.values()],
+            ordered=False,
+        )
+    if settings.SEARCH_INDEX_ENABLED:
+        for job in unique_jobs.values():
+            job_search_index.add(job)
+    return BulkWriteSummary.from_result(result)
+
+async def add_search_key(job_ids: list[int], search_key: str) -> int:
+    """add search_key to the search_keys of stored jobs, in a single update
+
+    Args:
+        job_ids (list[int]): jobs found by the search
+        search_key (str): search key of the search
+
+    Returns:
+        int: number of jobs that didn't have search_key yet
+    """
+    if not job_ids:
+        return 0
+    with DB_QUERY_SECONDS.labels('add_search_key').time():
+        result = await Job.get_motor_collection().update_many(
+            {'job_id': {'$in': job_ids}, 'search_keys': {'$ne': search_key}},
+            {'$addToSet': {'search_keys': search_key}},
+        )
+    return result.modified_count
+
+async def bulk_upsert_job_user_links(job_ids: list[int], user_id: uuid.UUID) -> BulkWriteSummary:
+    """link many jobs to a user in a single unordered bulk write
+
+    Args:
+        job_ids (list[int]): ids of the jobs to link
+        user_id (uuid.UUID): id of the user to link them to
+
+    Returns:
+        BulkWriteSummary: how many links were inserted, modified and left unchanged
+    """
+    now = datetime.now(tz=timezone.utc)
+    encoder = Encoder(to_db=True)
+    unique_job_ids = list(dict.fromkeys(job_ids))
+    if not unique_job_ids:
+        return BulkWriteSummary()
+    with DB_QUERY_SECONDS.labels('upsert_links').time():
+        result = await JobUserLink.get_motor_collection().bulk_write(
+            [
+                UpdateOne(
+                    {'_id': encoder.encode(make_job_user_link_id(job_id, user_id))},
+                    {
+                        '$set': {'last_updated': now},
+                        '$setOnInsert': {'job_id': job_id, 'user_id': encoder.encode(user_id)},
+                    },
+                    upsert=True,
+                )
+                for job_id in unique_job_ids
+            ],
+            ordered=False,
+        )
+    return BulkWriteSummary.from_result(result)
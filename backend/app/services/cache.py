@@ -0,0 +1,121 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic, Iterable, TypeVar
+import time
+
+V = TypeVar('V')
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    size: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class CacheBackend(ABC, Generic[V]):
+    """interface every cache backend implements, so an in-process cache can be swapped
+    for a shared one without touching its callers. Entries can be tagged so that
+    every entry sharing a tag can be invalidated at once.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> V | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: V, tags: Iterable[str] = ()):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    async def invalidate_tag(self, tag: str):
+        ...
+
+    @abstractmethod
+    async def clear(self):
+        ...
+
+    @property
+    @abstractmethod
+    def stats(self) -> CacheStats:
+        ...
+
+
+class InMemoryCache(CacheBackend[V]):
+    """in-process cache with a per-entry time to live and least recently used eviction"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        if max_entries <= 0:
+            raise ValueError(f'max_entries must be > 0. value: {max_entries}')
+        if ttl_seconds <= 0:
+            raise ValueError(f'ttl_seconds must be > 0. value: {ttl_seconds}')
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        # key -> (expires_at, value, tags), ordered from least to most recently used
+        self._entries: OrderedDict[str, tuple[float, V, frozenset[str]]] = OrderedDict()
+        self._keys_by_tag: dict[str, set[str]] = {}
+        self._stats = CacheStats()
+
+    def _remove(self, key: str):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            tagged_keys = self._keys_by_tag.get(tag)
+            if tagged_keys is not None:
+                tagged_keys.discard(key)
+                if not tagged_keys:
+                    del self._keys_by_tag[tag]
+
+    async def get(self, key: str) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self._stats.misses += 1
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self._stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self._stats.hits += 1
+        return value
+
+    async def set(self, key: str, value: V, tags: Iterable[str] = ()):
+        if key in self._entries:
+            self._remove(key)
+        tags = frozenset(tags)
+        self._entries[key] = (time.monotonic() + self._ttl_seconds, value, tags)
+        for tag in tags:
+            self._keys_by_tag.setdefault(tag, set()).add(key)
+        while len(self._entries) > self._max_entries:
+            self._remove(next(iter(self._entries)))
+            self._stats.evictions += 1
+
+    async def delete(self, key: str):
+        if key in self._entries:
+            self._remove(key)
+            self._stats.invalidations += 1
+
+    async def invalidate_tag(self, tag: str):
+        for key in list(self._keys_by_tag.get(tag, ())):
+            self._remove(key)
+            self._stats.invalidations += 1
+
+    async def clear(self):
+        self._entries.clear()
+        self._keys_by_tag.clear()
+
+    @property
+    def stats(self) -> CacheStats:
+        self._stats.size = len(self._entries)
+        return self._stats
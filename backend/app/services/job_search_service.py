@@ -1,8 +1,37 @@
 from datetime import datetime, timezone, timedelta
-from app.services.scraping_service import JobPostScraper, JobContentScraper
+from contextlib import aclosing
+from typing import AsyncIterator
+import asyncio
+from app.services.scraping_service import LISTING_PAGE_SIZE, JobPostScraper, JobContentScraper, JobScrapeError
 from app.models.jobs import JobPosting, Job
-from beanie.odm.operators.update.general import Set
+from beanie.operators import In
+from app.services.bulk_write_service import BulkWriteSummary, add_search_key, bulk_upsert_jobs
+from app.services.cache import CacheBackend, InMemoryCache
+from app.services.scrape_queue import QueuedJobContentScraper, QueuedJobPostScraper
+from app.services.search_index import job_search_index
+from app.services.search_key_service import (
+    advance_scrape_frontier,
+    count_search,
+    get_scrape_frontier,
+    get_search_key,
+    record_listing_scrape,
+)
+from app.services.single_flight import SingleFlight
 from app.core.config import settings
+from app.core.metrics import DB_QUERY_SECONDS, SEARCH_RESULTS, SEARCH_SECONDS, track_cache
+
+# search results keyed on JobSearchService.cache_key and tagged with the search_key
+search_cache: CacheBackend[list[Job]] = InMemoryCache(
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS
+)
+# concurrent identical searches share a single search, keyed on JobSearchService.cache_key
+search_flights: SingleFlight[list[Job]] = SingleFlight()
+track_cache('search', search_cache)
+
+def normalize_search_text(text: str) -> str:
+    """keywords or location as they key a search, differing case and whitespace make the same search"""
+    return ' '.join(text.lower().split())
 
 class JobSearchService:
     def __init__(
@@ -13,13 +42,20 @@ class JobSearchService:
             start: int=0,
             limit: int=10
             ):
-        self._job_post_scraper = JobPostScraper()
-        self._job_content_scraper = JobContentScraper()
+        if settings.SCRAPE_MODE == 'queue':
+            # the scrape workers fetch the pages, see worker.py
+            self._job_post_scraper = QueuedJobPostScraper()
+            self._job_content_scraper = QueuedJobContentScraper()
+        else:
+            self._job_post_scraper = JobPostScraper()
+            self._job_content_scraper = JobContentScraper()
         self._keywords = keywords
         self._location = location
         self._max_days_since_posted = max_days_since_posted
         self._start = start
         self._limit = limit
+        # set when a job page of the last search couldn't be scraped, leaving its results incomplete
+        self._scrape_failed = False
         
     @property
     def keywords(self) -> str:
@@ -43,8 +79,13 @@ class JobSearchService:
 
     @property
     def search_key(self) -> str:
-        return self._keywords.lower().strip()+self._location.lower().strip()
+        """keys what is stored for the search: the jobs found, the cached results, the listing coverage and frontier"""
+        return normalize_search_text(self._keywords) + normalize_search_text(self._location)
     
+    @property
+    def cache_key(self) -> str:
+        return f'{self.search_key}|{self.max_days_since_posted}|{self.start}|{self.limit}'
+
     @property
     def max_days_since_posted(self) -> int:
         return self._max_days_since_posted
@@ -81,70 +122,275 @@ class JobSearchService:
         # only request in increments of 10
         self._limit = new_limit - new_limit % 10 if new_limit > 10 else 10
 
-    def _check_cache(self) -> list[Job]:
-        ...
+    async def _check_cache(self) -> list[Job] | None:
+        jobs = await search_cache.get(self.cache_key)
+        return list(jobs) if jobs is not None else None
 
-    async def _search_db(self) -> list[Job]:
+    def _find_db(self):
         cutoff_date = datetime.now(tz=timezone.utc) - timedelta(days=self.max_days_since_posted)
-        jobs = await Job.find(
+        return Job.find(
             Job.search_keys == self.search_key,
             Job.date_posted >= cutoff_date
-            ).limit(self.limit).to_list()
+            )
+
+    async def _search_db(self) -> list[Job]:
+        with DB_QUERY_SECONDS.labels('search_db').time():
+            jobs = await self._find_db().limit(self.limit).to_list()
         return jobs
 
-    async def _scrape_jobs(self) -> list[Job]:
-        job_postings = [
-            JobPosting(
-                **job_posting
-                ) for job_posting in self._job_post_scraper.get_postings(
-                    keywords=self.keywords,
-                    location=self.location,
-                    max_days_since_posted=self.max_days_since_posted,
-                    start=self.start,
-                    limit=self.limit
-                    )
-                ]
-        jobs = [
-            Job(
-                **self._job_content_scraper.get_job_content(job_id=job_posting.job_id),
-                benefits=job_posting.benefits,
-                date_posted=job_posting.date_posted,
-                search_keys=[self.search_key],
-                ) for job_posting in job_postings
-            ]
-        for job in jobs:
-            await Job.find_one(Job.job_id == job.job_id).upsert(
-                Set(
-                    {
-                        'last_updated': datetime.now(tz=timezone.utc),
-                        'date_posted': job.date_posted,
-                        'num_applicants': job.num_applicants
-                        }
+    async def _count_db(self) -> int:
+        with DB_QUERY_SECONDS.labels('count_db').time():
+            return await self._find_db().count()
+
+    async def _search_index(self, exclude_job_ids: set[int], limit: int) -> list[Job]:
+        """find jobs scraped for other searches that match this one's keywords and location"""
+        if not settings.SEARCH_INDEX_ENABLED or not job_search_index.ready:
+            return []
+        cutoff_date = datetime.now(tz=timezone.utc) - timedelta(days=self.max_days_since_posted)
+        job_ids = job_search_index.search(
+            keywords=self.keywords,
+            location=self.location,
+            posted_after=cutoff_date,
+            limit=limit,
+            exclude_job_ids=exclude_job_ids
+            )
+        if not job_ids:
+            return []
+        with DB_QUERY_SECONDS.labels('search_index').time():
+            jobs_by_id = {job.job_id: job for job in await Job.find(In(Job.job_id, job_ids)).to_list()}
+        return [jobs_by_id[job_id] for job_id in job_ids if job_id in jobs_by_id]
+
+    async def _scrape_postings(self) -> dict[int, list[JobPosting]]:
+        """scrape the listing pages of the search not fetched recently
+
+        Returns:
+            dict[int, list[JobPosting]]: offset of each listing page fetched -> the postings it held, in listing order.
+                the last page is empty if the listing ran out
+        """
+        frontier = await get_scrape_frontier(self.search_key, self.max_days_since_posted)
+        start = self.start
+        if frontier is not None:
+            # continue after the listing pages fetched and stored recently instead of walking them again
+            frontier_start = frontier.next_offset(
+                self.start,
+                page_size=LISTING_PAGE_SIZE,
+                fresh_after=timedelta(seconds=settings.SEARCH_KEY_FRESH_SECONDS)
+                )
+            frontier_end = frontier_start if frontier_start is not None else frontier.end_offset
+            if frontier_end > start:
+                # the db has the final say over the pages the frontier skips, their jobs may be gone since
+                stored_jobs = await self._count_db()
+                stored_start = max(start, frontier.stored_through(stored_jobs, frontier_end, page_size=LISTING_PAGE_SIZE))
+                if stored_start < frontier_end:
+                    settings.logger.info(f'the db holds {stored_jobs} jobs of the listing, scraping it from job {stored_start}')
+                    frontier_start = stored_start
+            if frontier_start is None:
+                settings.logger.info('the listing ended before the first page not fetched recently, nothing to scrape')
+                return {}
+            if frontier_start > start:
+                settings.logger.info(f'scraping the listing from job {frontier_start}, the pages before it were fetched recently')
+            start = frontier_start
+        listing_pages = await self._job_post_scraper.get_listing_pages(
+            keywords=self.keywords,
+            location=self.location,
+            max_days_since_posted=self.max_days_since_posted,
+            start=start,
+            limit=self.limit
+            )
+        return {
+            page_start: [JobPosting(**job_posting) for job_posting in job_postings]
+            for page_start, job_postings in zip(JobPostScraper.page_starts(start, self.limit), listing_pages)
+        }
+
+    async def _record_stored_pages(self, listing_pages: dict[int, list[JobPosting]], stored_job_ids: set[int]):
+        """record how deep into the listing the scrape got, and which pages it fetched, counting only the pages
+        whose jobs were all stored, so a page whose jobs couldn't be scraped is neither taken for covered
+        nor skipped by later searches
+
+        Args:
+            listing_pages (dict[int, list[JobPosting]]): offset of each listing page fetched -> the postings it held
+            stored_job_ids (set[int]): ids of the postings whose jobs are in the db
+        """
+        if not listing_pages:
+            return
+        page_starts = list(listing_pages)
+        # pages can hold fewer postings than LISTING_PAGE_SIZE, only a page that came back empty ends the listing
+        end_offset = next((page_start for page_start, job_postings in listing_pages.items() if not job_postings), None)
+        stored_pages = {
+            page_start: len(job_postings) for page_start, job_postings in listing_pages.items()
+            if job_postings and all(job_posting.job_id in stored_job_ids for job_posting in job_postings)
+            }
+        stored_page_starts = list(stored_pages)
+        # depth only counts up to the first page with a job missing, or the end of the listing
+        leading_pages_stored = 0
+        while leading_pages_stored < len(stored_page_starts) and stored_page_starts[leading_pages_stored] == page_starts[leading_pages_stored]:
+            leading_pages_stored += 1
+        await asyncio.gather(
+            record_listing_scrape(
+                self.search_key,
+                max_days_since_posted=self.max_days_since_posted,
+                pages_scraped=page_starts[0] // LISTING_PAGE_SIZE + leading_pages_stored,
+                listing_exhausted=end_offset is not None and leading_pages_stored == len(page_starts) - 1
+                ),
+            advance_scrape_frontier(
+                self.search_key,
+                max_days_since_posted=self.max_days_since_posted,
+                stored_pages=stored_pages,
+                end_offset=end_offset
                 ),
-                on_insert=job
+        )
+
+    def _build_job(self, job_posting: JobPosting, job_content: dict) -> Job:
+        return Job(
+            **job_content,
+            benefits=job_posting.benefits,
+            date_posted=job_posting.date_posted,
+            search_keys=[self.search_key],
             )
-        return jobs
+
+    async def _find_fresh_jobs(self, job_ids: list[int]) -> dict[int, Job]:
+        """the stored jobs among job_ids that were updated recently enough not to be scraped again"""
+        if not job_ids:
+            return {}
+        cutoff_date = datetime.now(tz=timezone.utc) - timedelta(seconds=settings.SCRAPE_JOB_FRESH_SECONDS)
+        with DB_QUERY_SECONDS.labels('find_fresh_jobs').time():
+            fresh_jobs = await Job.find(In(Job.job_id, job_ids), Job.last_updated >= cutoff_date).to_list()
+        settings.logger.info(f'{len(fresh_jobs)} of {len(job_ids)} listed jobs are stored and fresh, skipping their detail pages')
+        # the listing found them for this search, so they join it
+        await add_search_key([job.job_id for job in fresh_jobs], self.search_key)
+        for job in fresh_jobs:
+            if self.search_key not in job.search_keys:
+                job.search_keys.append(self.search_key)
+        return {job.job_id: job for job in fresh_jobs}
+
+    async def _scrape_jobs(self) -> list[Job]:
+        listing_pages = await self._scrape_postings()
+        job_postings = [job_posting for page_job_postings in listing_pages.values() for job_posting in page_job_postings]
+        fresh_jobs = await self._find_fresh_jobs([job_posting.job_id for job_posting in job_postings])
+        new_job_postings = [job_posting for job_posting in job_postings if job_posting.job_id not in fresh_jobs]
+        job_contents = await self._job_content_scraper.get_jobs_content(
+            [job_posting.job_id for job_posting in new_job_postings]
+            )
+        scraped_jobs = {}
+        for job_posting, job_content in zip(new_job_postings, job_contents):
+            if isinstance(job_content, JobScrapeError):
+                settings.logger.warning(f'skipping job that could not be scraped - {job_content}')
+                self._scrape_failed = True
+                continue
+            scraped_jobs[job_posting.job_id] = self._build_job(job_posting, job_content)
+        upsert_summary = await bulk_upsert_jobs(list(scraped_jobs.values()))
+        settings.logger.info(f'scraped jobs upserted: {upsert_summary}')
+        await self._record_stored_pages(listing_pages, fresh_jobs.keys() | scraped_jobs.keys())
+        if scraped_jobs:
+            await search_cache.invalidate_tag(self.search_key)
+        # in listing order, each job once
+        jobs = {}
+        for job_posting in job_postings:
+            job = fresh_jobs.get(job_posting.job_id) or scraped_jobs.get(job_posting.job_id)
+            if job is not None:
+                jobs.setdefault(job.job_id, job)
+        return list(jobs.values())
+
+    async def _iter_scraped_jobs(self) -> AsyncIterator[Job]:
+        """scrape jobs, yielding each one as soon as it is parsed and upserted,
+        after the listed jobs that are already stored and fresh
+        """
+        listing_pages = await self._scrape_postings()
+        job_postings = {
+            job_posting.job_id: job_posting
+            for page_job_postings in listing_pages.values() for job_posting in page_job_postings
+            }
+        fresh_jobs = await self._find_fresh_jobs(list(job_postings))
+        stored_job_ids = set(fresh_jobs)
+        try:
+            for job in fresh_jobs.values():
+                yield job
+            new_job_ids = [job_id for job_id in job_postings if job_id not in fresh_jobs]
+            async for job_id, job_content in self._job_content_scraper.iter_jobs_content(new_job_ids):
+                if isinstance(job_content, JobScrapeError):
+                    settings.logger.warning(f'skipping job that could not be scraped - {job_content}')
+                    continue
+                job = self._build_job(job_postings[job_id], job_content)
+                await bulk_upsert_jobs([job])
+                stored_job_ids.add(job_id)
+                yield job
+        finally:
+            # the caller may stop early, what got stored until then still counts
+            await self._record_stored_pages(listing_pages, stored_job_ids)
+            if len(stored_job_ids) > len(fresh_jobs):
+                await search_cache.invalidate_tag(self.search_key)
 
     async def search(self) -> list[Job]:
+        with SEARCH_SECONDS.time():
+            jobs = await search_flights.do(self.cache_key, self._search_cached)
+        # every caller sharing the search gets a list of its own
+        return list(jobs)
+
+    async def _search_cached(self) -> list[Job]:
+        cache_key = self.cache_key
+        jobs = await self._check_cache()
+        if jobs is not None:
+            settings.logger.info(f'{len(jobs)} results returned from cache')
+            SEARCH_RESULTS.labels('cache').inc(len(jobs))
+            return jobs
+        self._scrape_failed = False
+        jobs = await self._search()
+        # a transient scrape failure shouldn't pin a short answer for the whole ttl
+        if len(jobs) >= self.limit or not self._scrape_failed:
+            await search_cache.set(cache_key, list(jobs), tags=[self.search_key])
+        else:
+            settings.logger.info(f'{len(jobs)} results not cached, some jobs could not be scraped')
+        return jobs
+
+    async def _db_covers_search(self) -> bool:
+        """whether a recent scrape of this search's listing already stored everything it can return"""
+        search_key = await get_search_key(self.search_key)
+        return search_key is not None and search_key.covers(
+            max_days_since_posted=self.max_days_since_posted,
+            start=self.start,
+            limit=self.limit,
+            page_size=LISTING_PAGE_SIZE,
+            fresh_after=timedelta(seconds=settings.SEARCH_KEY_FRESH_SECONDS)
+            )
+
+    async def _search(self) -> list[Job]:
         # check the db
         jobs = await self._search_db()
         job_count = len(jobs)
-        if job_count == self.limit:
+        SEARCH_RESULTS.labels('database').inc(job_count)
+        if job_count < self.limit:
+            index_jobs = await self._search_index(
+                exclude_job_ids={job.job_id for job in jobs},
+                limit=self.limit - job_count
+                )
+            if index_jobs:
+                settings.logger.info(f'{len(index_jobs)} results returned from the full-text index')
+                SEARCH_RESULTS.labels('index').inc(len(index_jobs))
+                jobs.extend(index_jobs)
+        if len(jobs) == self.limit:
             settings.logger.info(f'all {self.limit} results returned from database')
+            await count_search(self.search_key, answered_by_db=True)
             return jobs
-        elif job_count > self.limit:
+        elif len(jobs) > self.limit:
             settings.logger.info(f'limit not properly implemented, {self.limit} jobs requested but {len(jobs)} returned')
+            await count_search(self.search_key, answered_by_db=True)
             return jobs
-        elif job_count > 0:
-            settings.logger.info(f'{job_count} results returned from database')
+        elif await self._db_covers_search():
+            settings.logger.info(f'{len(jobs)} results returned from database, a recent scrape of the listing already covers the search')
+            await count_search(self.search_key, answered_by_db=True)
+            return jobs
+        await count_search(self.search_key, answered_by_db=False)
+        if len(jobs) > 0:
+            settings.logger.info(f'{len(jobs)} results returned from database')
             # if returns less postings than requested,
             # scrape the minimum required and combine with db ones
             original_limit = self.limit
             self.limit = self.limit - len(jobs)
-            self.start = job_count
-            settings.logger.info(f'scraping {self.limit} more jobs starting at job {self.start}...')
-            jobs.extend(await self._scrape_jobs())
+            settings.logger.info(f'scraping {self.limit} more jobs...')
+            found_job_ids = {job.job_id for job in jobs}
+            jobs.extend(job for job in await self._scrape_jobs() if job.job_id not in found_job_ids)
             self.limit = original_limit
+            SEARCH_RESULTS.labels('scrape').inc(len(jobs[:self.limit]) - len(found_job_ids))
             settings.logger.info(f'{len(jobs)} total jobs retreived')
             settings.logger.info(f'{len(jobs[:self.limit])} jobs returned to user')
             return jobs[:self.limit]
@@ -153,8 +399,76 @@ class JobSearchService:
         
         # scrape jobs and write to db
         jobs = await self._scrape_jobs()
+        SEARCH_RESULTS.labels('scrape').inc(len(jobs))
         settings.logger.info(f'{len(jobs)} documents returned from scraper and upserted into the db')
         return jobs
 
+    async def search_iter(self) -> AsyncIterator[Job]:
+        """same as search, but yields database results first and then each scraped job
+        as soon as it has been parsed and upserted
+        """
+        jobs = await self._search_db()
+        job_count = len(jobs)
+        settings.logger.info(f'{job_count} results returned from database')
+        for job in jobs[:self.limit]:
+            yield job
+        if job_count < self.limit:
+            index_jobs = await self._search_index(
+                exclude_job_ids={job.job_id for job in jobs},
+                limit=self.limit - job_count
+                )
+            settings.logger.info(f'{len(index_jobs)} results returned from the full-text index')
+            for job in index_jobs:
+                yield job
+            jobs.extend(index_jobs)
+        if len(jobs) >= self.limit or await self._db_covers_search():
+            await count_search(self.search_key, answered_by_db=True)
+            return
+        await count_search(self.search_key, answered_by_db=False)
+
+        original_limit = self.limit
+        seen_job_ids = {job.job_id for job in jobs}
+        self.limit = self.limit - len(jobs)
+        settings.logger.info(f'streaming up to {self.limit} more jobs...')
+        try:
+            # closed as soon as the search is done, so what it stored is recorded right away
+            async with aclosing(self._iter_scraped_jobs()) as scraped_jobs:
+                async for job in scraped_jobs:
+                    if job.job_id in seen_job_ids:
+                        continue
+                    seen_job_ids.add(job.job_id)
+                    yield job
+                    if len(seen_job_ids) >= original_limit:
+                        return
+        finally:
+            self.limit = original_limit
+
+    async def refresh_stale_jobs(self, stale_after: timedelta, limit: int) -> BulkWriteSummary:
+        """re-scrape the jobs of this search that haven't been updated within stale_after
+
+        Args:
+            stale_after (timedelta): jobs last updated longer ago than this are re-scraped
+            limit (int): max number of jobs to re-scrape, least recently updated first
+
+        Returns:
+            BulkWriteSummary: result of upserting the re-scraped jobs
+        """
+        cutoff_date = datetime.now(tz=timezone.utc) - stale_after
+        stale_jobs = await Job.find(
+            Job.search_keys == self.search_key,
+            Job.last_updated < cutoff_date
+            ).sort(+Job.last_updated).limit(limit).to_list()
+        job_contents = await self._job_content_scraper.get_jobs_content([job.job_id for job in stale_jobs])
+        refreshed_jobs = []
+        for job, job_content in zip(stale_jobs, job_contents):
+            if isinstance(job_content, JobScrapeError):
+                settings.logger.warning(f'skipping job that could not be refreshed - {job_content}')
+                continue
+            refreshed_jobs.append(job.model_copy(update={'num_applicants': job_content.get('num_applicants')}))
+        summary = await bulk_upsert_jobs(refreshed_jobs)
+        if refreshed_jobs:
+            await search_cache.invalidate_tag(self.search_key)
+        return summary
+
     async def get_by_id(self, job_id) -> Job | None:
         return Job.find_one(filter={'job_id': job_id})
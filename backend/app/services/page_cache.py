@@ -0,0 +1,280 @@
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from app.core.config import settings
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def _write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # unique per write, concurrent writers of the same path each get their own
+    tmp_path = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, path)
+
+def _unlink(path: Path):
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+@dataclass
+class CachedPage:
+    key: str
+    content_hash: str
+    fetched_at: float
+    etag: str | None = None
+    last_modified: str | None = None
+
+    def is_fresh(self, fresh_seconds: float) -> bool:
+        return time.time() - self.fetched_at < fresh_seconds
+
+    def conditional_headers(self) -> dict[str, str]:
+        """headers asking the server to answer 304 Not Modified if the page hasn't changed"""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """on-disk cache of raw pages and their parsed content
+
+    raw pages and parsed content are content-addressed, stored gzipped under the hash of the raw page,
+    so a page that comes back unchanged maps onto what was already stored and parsed.
+    every key points at the hash of its latest page, together with when it was fetched
+    and the validators needed to revalidate it.
+    least recently used keys are evicted once the stored files exceed max_bytes.
+
+    layout:
+        entries/<hash of key>.json          CachedPage of the key
+        pages/<hash[:2]>/<hash>.html.gz     raw page
+        parsed/<hash[:2]>/<hash>.<parser>.json.gz   parsed page, per parser
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int, fresh_seconds: float):
+        if max_bytes <= 0:
+            raise ValueError(f'max_bytes must be > 0. value: {max_bytes}')
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        # key -> CachedPage, ordered from least to most recently used
+        self._pages: OrderedDict[str, CachedPage] = OrderedDict()
+        # content hash -> bytes stored for it and number of keys pointing at it
+        self._hash_sizes: dict[str, int] = {}
+        self._hash_refs: dict[str, int] = {}
+        self._size = 0
+        # (content hash, parser) of parsed pages being written, so concurrent writers of one only write it once
+        self._parsed_writes: set[tuple[str, str]] = set()
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def page_count(self) -> int:
+        return len(self._pages)
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / 'entries' / f'{hashlib.sha256(key.encode()).hexdigest()[:32]}.json'
+
+    def _page_path(self, page_hash: str) -> Path:
+        return self.directory / 'pages' / page_hash[:2] / f'{page_hash}.html.gz'
+
+    def _parsed_path(self, page_hash: str, parser: str) -> Path:
+        return self.directory / 'parsed' / page_hash[:2] / f'{page_hash}.{parser}.json.gz'
+
+    def _hash_files(self, page_hash: str) -> list[Path]:
+        return [self._page_path(page_hash), *self._parsed_path(page_hash, '*').parent.glob(f'{page_hash}.*.json.gz')]
+
+    def _remove_files(self, keys: list[str], page_hashes: list[str]):
+        for key in keys:
+            _unlink(self._entry_path(key))
+        for page_hash in page_hashes:
+            for path in self._hash_files(page_hash):
+                _unlink(path)
+
+    def _load_index(self) -> tuple[list[CachedPage], dict[str, int]]:
+        pages = []
+        for entry_path in (self.directory / 'entries').glob('*.json'):
+            try:
+                pages.append(CachedPage(**json.loads(entry_path.read_text())))
+            except (OSError, ValueError, TypeError):
+                _unlink(entry_path)
+        pages.sort(key=lambda page: page.fetched_at)
+        hash_sizes = {}
+        for page in pages:
+            if page.content_hash not in hash_sizes:
+                hash_sizes[page.content_hash] = sum(
+                    path.stat().st_size for path in self._hash_files(page.content_hash) if path.exists()
+                    )
+        return pages, hash_sizes
+
+    async def _ensure_loaded(self):
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            pages, hash_sizes = await asyncio.to_thread(self._load_index)
+            for page in pages:
+                self._add(page)
+            for page_hash, size in hash_sizes.items():
+                self._hash_sizes[page_hash] = size
+                self._size += size
+            self._loaded = True
+            settings.logger.info(f'page cache loaded: {len(self._pages)} pages, {self._size} bytes')
+
+    def _add(self, page: CachedPage):
+        previous = self._pages.pop(page.key, None)
+        if previous is not None:
+            self._release(previous.content_hash)
+        self._pages[page.key] = page
+        self._hash_refs[page.content_hash] = self._hash_refs.get(page.content_hash, 0) + 1
+
+    def _release(self, page_hash: str) -> bool:
+        """drop a reference to a content hash, returning True if nothing points at it anymore"""
+        refs = self._hash_refs[page_hash] - 1
+        if refs:
+            self._hash_refs[page_hash] = refs
+            return False
+        del self._hash_refs[page_hash]
+        return True
+
+    async def get(self, key: str) -> CachedPage | None:
+        await self._ensure_loaded()
+        page = self._pages.get(key)
+        if page is not None:
+            self._pages.move_to_end(key)
+        return page
+
+    async def read(self, page: CachedPage) -> str | None:
+        """the raw page, None if it has been evicted"""
+        def read_page() -> str | None:
+            try:
+                return gzip.decompress(self._page_path(page.content_hash).read_bytes()).decode()
+            except (FileNotFoundError, EOFError, gzip.BadGzipFile):
+                return None
+        return await asyncio.to_thread(read_page)
+
+    async def read_parsed(self, page: CachedPage, parser: str) -> dict | None:
+        """the page as parsed by parser, None if it hasn't been parsed by it or has been evicted"""
+        def read_parsed() -> dict | None:
+            try:
+                return json.loads(gzip.decompress(self._parsed_path(page.content_hash, parser).read_bytes()))
+            except (FileNotFoundError, EOFError, gzip.BadGzipFile, ValueError):
+                return None
+        return await asyncio.to_thread(read_parsed)
+
+    async def put(
+            self,
+            key: str,
+            content: str,
+            etag: str | None = None,
+            last_modified: str | None = None
+            ) -> CachedPage:
+        """store a freshly fetched page for key
+
+        Returns:
+            CachedPage: the stored page
+        """
+        await self._ensure_loaded()
+        page = CachedPage(
+            key=key,
+            content_hash=content_hash(content),
+            fetched_at=time.time(),
+            etag=etag,
+            last_modified=last_modified,
+        )
+        if page.content_hash not in self._hash_sizes:
+            self._hash_sizes[page.content_hash] = 0
+            compressed = await asyncio.to_thread(gzip.compress, content.encode())
+            await asyncio.to_thread(_write_atomic, self._page_path(page.content_hash), compressed)
+            self._hash_sizes[page.content_hash] += len(compressed)
+            self._size += len(compressed)
+        await self._write_entry(page)
+        return page
+
+    async def put_parsed(self, page: CachedPage, parser: str, parsed: dict):
+        """store the page as parsed by parser, so an unchanged page doesn't need parsing again"""
+        parsed_write = (page.content_hash, parser)
+        if page.content_hash not in self._hash_sizes or parsed_write in self._parsed_writes:
+            return
+        self._parsed_writes.add(parsed_write)
+        try:
+            path = self._parsed_path(page.content_hash, parser)
+            if await asyncio.to_thread(path.exists):
+                return
+            compressed = await asyncio.to_thread(gzip.compress, json.dumps(parsed).encode())
+            await asyncio.to_thread(_write_atomic, path, compressed)
+            if page.content_hash not in self._hash_sizes:
+                # the page was evicted while its parse was being written
+                await asyncio.to_thread(_unlink, path)
+                return
+            self._hash_sizes[page.content_hash] += len(compressed)
+            self._size += len(compressed)
+        finally:
+            self._parsed_writes.discard(parsed_write)
+        await self._evict()
+
+    async def revalidated(self, page: CachedPage, etag: str | None = None, last_modified: str | None = None) -> CachedPage:
+        """mark a page as fetched now, after the server confirmed it hasn't changed
+
+        Returns:
+            CachedPage: the refreshed page
+        """
+        await self._ensure_loaded()
+        page = CachedPage(
+            key=page.key,
+            content_hash=page.content_hash,
+            fetched_at=time.time(),
+            etag=etag or page.etag,
+            last_modified=last_modified or page.last_modified,
+        )
+        await self._write_entry(page)
+        return page
+
+    async def _write_entry(self, page: CachedPage):
+        await asyncio.to_thread(_write_atomic, self._entry_path(page.key), json.dumps(asdict(page)).encode())
+        self._add(page)
+        await self._evict()
+
+    async def _evict(self):
+        evicted_keys, evicted_hashes = [], []
+        # the most recently used page stays even if it alone is over the limit
+        while self._size > self.max_bytes and len(self._pages) > 1:
+            _, page = self._pages.popitem(last=False)
+            evicted_keys.append(page.key)
+            if self._release(page.content_hash):
+                self._size -= self._hash_sizes.pop(page.content_hash, 0)
+                evicted_hashes.append(page.content_hash)
+        if evicted_keys:
+            await asyncio.to_thread(self._remove_files, evicted_keys, evicted_hashes)
+
+    async def clear(self):
+        await self._ensure_loaded()
+        keys, page_hashes = list(self._pages), list(self._hash_sizes)
+        self._pages.clear()
+        self._hash_sizes.clear()
+        self._hash_refs.clear()
+        self._size = 0
+        await asyncio.to_thread(self._remove_files, keys, page_hashes)
+
+
+page_cache = PageCache(
+    directory=settings.PAGE_CACHE_DIR,
+    max_bytes=settings.PAGE_CACHE_MAX_BYTES,
+    fresh_seconds=settings.PAGE_CACHE_FRESH_SECONDS
+)
@@ -0,0 +1,320 @@
+from abc import ABC, abstractmethod
+from bs4 import BeautifulSoup
+from bs4.element import ResultSet, Tag
+import lxml.html
+from lxml import etree
+from app.core.config import settings
+
+class JobPageParser(ABC):
+    """turns raw html from LinkedIn job pages into the dicts the scrapers return"""
+
+    @abstractmethod
+    def parse_listing(self, raw_listing: str) -> list[dict]:
+        """parse every job post out of a LinkedIn job list page
+
+        Args:
+            raw_listing (str): raw html from LinkedIn job list page
+
+        Returns:
+            list[dict]: parsed job post data, one dict per job post
+        """
+
+    @abstractmethod
+    def parse_job(self, raw_job: str) -> dict:
+        """parse key data from a LinkedIn job page
+
+        Args:
+            raw_job (str): raw html from a LinkedIn job page
+
+        Returns:
+            dict: parsed job data
+        """
+
+    def _drop_unparsed(self, job_posts: list[dict | None]) -> list[dict]:
+        """the job posts parse_listing could parse, logging the list items it skipped"""
+        parsed_job_posts = [job_data for job_data in job_posts if job_data is not None]
+        if len(parsed_job_posts) < len(job_posts):
+            settings.logger.warning(f'skipped {len(job_posts) - len(parsed_job_posts)} listing items without a job card')
+        return parsed_job_posts
+
+
+class BeautifulSoupParser(JobPageParser):
+    def parse_listing(self, raw_listing: str) -> list[dict]:
+        return self._drop_unparsed([self._parse_job_post(job_post) for job_post in self._parse_listing(raw_listing)])
+
+    def parse_job(self, raw_job: str) -> dict:
+        return self._parse_job_data(BeautifulSoup(raw_job, 'html.parser'))
+
+    def _parse_listing(self, raw_listing: str) -> ResultSet:
+        """parse raw html from LinkedIn job list page
+
+        Args:
+            raw_listing (str): raw html from LinkedIn job list page
+
+        Returns:
+            ResultSet: a list-like object containing li html objects from LinkedIn job list page
+        """
+        list_soup = BeautifulSoup(raw_listing, 'html.parser')
+        parsed_listing = list_soup.find_all('li')
+        return parsed_listing
+
+    def _parse_job_post(self, job_post: Tag) -> dict | None:
+        """parse job post data out of a LinkedIn job posting
+
+        Args:
+            job_post (Tag): LinkedIn job posting to be parsed
+
+        Returns:
+            dict | None: parsed job post data, None if the posting has no job card to parse
+        """
+        job_data = {}
+        base_card_data = job_post.find('div', {'class': 'base-card'}) or job_post.find('a', {'class': 'base-card'})
+        if base_card_data is None or not base_card_data.get('data-entity-urn'):
+            return None
+        job_data['id'] = base_card_data.get('data-entity-urn').split(':')[3]
+        try:
+            job_data['title'] = base_card_data.find('h3', {'class': 'base-search-card__title'}).text.strip()
+        except AttributeError:
+            try:
+                job_data['title'] = base_card_data.find('span', {'class': 'sr-only'}).text.strip()
+            except Exception:
+                pass # pydantic will assign it None if not provided
+        try:
+            job_data['company'] = base_card_data.find('h4', {'class': 'base-search-card__subtitle'}).text.strip()
+        except:
+            pass # pydantic will assign it None if not provided
+        try:
+            job_data['location'] = base_card_data.find('span', {'class': 'job-search-card__location'}).text.strip()
+        except:
+            pass # pydantic will assign it None if not provided
+        try:
+            job_data['benefits'] = base_card_data.find('span', {'class': 'job-posting-benefits__text'}).text.strip()
+        except:
+            pass # pydantic will assign it None if not provided
+        try:
+            job_data['date_posted'] = base_card_data.find('time', {'class': 'job-search-card__listdate'}).attrs['datetime']
+            job_data['time_since_posted'] = base_card_data.find('time', {'class': 'job-search-card__listdate'}).text.strip()
+        except AttributeError:
+            try:
+                job_data['date_posted'] = base_card_data.find('time', {'class': 'job-search-card__listdate--new'}).attrs['datetime']
+                job_data['time_since_posted'] = base_card_data.find('time', {'class': 'job-search-card__listdate--new'}).text.strip()
+            except Exception:
+                pass # pydantic will assign them None if not provided
+        return job_data
+
+    def _get_criteria_items(self, job_soup: BeautifulSoup) -> dict:
+        """extract job criteria items from a LinkedIn job
+
+        Args:
+            job_soup (BeautifulSoup): a BeautifulSoup object containing html from a LinkedIn job page
+
+        Returns:
+            dict: a dictionary of job criteria items
+        """
+        job_criteria_items = job_soup.find_all('li', class_='description__job-criteria-item')
+        if job_criteria_items:
+            job_criteria_data = {}
+            for item in job_criteria_items:
+                try:
+                    subheader = item.find('h3', class_='description__job-criteria-subheader').text.strip()
+                    criteria = item.find('span', class_='description__job-criteria-text').text.strip()
+                    job_criteria_data[subheader.lower().replace(' ', '_')] = criteria
+                except:
+                    continue # don't add anything
+            if job_criteria_data:
+                return job_criteria_data
+        return None
+    
+    def _parse_job_data(self, job_soup: BeautifulSoup) -> dict:
+        """parse key data from a LinkedIn job page
+
+        Args:
+            job_soup (BeautifulSoup): a BeautifulSoup object containing html from a LinkedIn job page
+
+        Returns:
+            dict: parsed job data
+        """
+        job_content = {}
+        try:
+            job_content['title'] = job_soup.find('h2', {'class': 'top-card-layout__title'}).text.strip()
+        except:
+            pass  # pydantic will assign it None if not provided
+        try:
+            job_content['company'] = job_soup.find('a', {'class': 'topcard__org-name-link topcard__flavor--black-link'}).text.strip()
+        except:
+            pass  # pydantic will assign it None if not provided
+        try:
+            job_content['location'] = job_soup.find('span', {'class': 'topcard__flavor topcard__flavor--bullet'}).text.strip()
+        except:
+            pass  # pydantic will assign it None if not provided
+        try:
+            job_content['salary_range'] = job_soup.find('div', {'class': 'salary compensation__salary'}).text.strip()
+        except:
+            pass  # pydantic will assign it None if not provided
+
+        # self._get_criteria_items handles exceptions
+        job_content['job_criteria_items'] = self._get_criteria_items(job_soup)
+
+        try:
+            job_content['time_since_posted'] = job_soup.find('span', {'class': 'posted-time-ago__text topcard__flavor--metadata'}).text.strip()
+        except AttributeError:
+            try:
+                job_content['time_since_posted'] = job_soup.find('span', {'class': 'posted-time-ago__text posted-time-ago__text--new topcard__flavor--metadata'}).text.strip()
+            except:
+                pass  # pydantic will assign it None if not provided
+        try:
+            job_content['num_applicants'] = job_soup.find('span', {'class': 'num-applicants__caption topcard__flavor--metadata topcard__flavor--bullet'}).text.strip()
+        except AttributeError:
+            try:
+                job_content['num_applicants'] = job_soup.find('figcaption', {'class': 'num-applicants__caption'}).text.strip()
+            except:
+                pass  # pydantic will assign it None if not provided
+        try:
+            job_content['description'] = job_soup.find('div', {'class': 'show-more-less-html__markup show-more-less-html__markup--clamp-after-5 relative overflow-hidden'}).text.strip()
+        except:
+            pass  # pydantic will assign it None if not provided
+        return job_content
+
+
+def _class_matches(class_attr: str, class_spec: str) -> bool:
+    """match a class attribute the way BeautifulSoup's find(tag, {'class': class_spec}) does:
+    either one of its classes equals class_spec, or the whole attribute does
+    """
+    classes = class_attr.split()
+    return class_spec in classes or ' '.join(classes) == class_spec
+
+def _first_matches(root: etree._Element, selectors: dict[str, tuple[str, str]]) -> dict[str, etree._Element]:
+    """walk the tree under root once and return the first element matching each selector
+
+    Args:
+        root (etree._Element): element to search under
+        selectors (dict[str, tuple[str, str]]): field name -> (tag, class spec)
+
+    Returns:
+        dict[str, etree._Element]: field name -> first matching element, for fields that matched
+    """
+    selectors_by_tag: dict[str, list[tuple[str, str]]] = {}
+    for field, (tag, class_spec) in selectors.items():
+        selectors_by_tag.setdefault(tag, []).append((field, class_spec))
+    matches = {}
+    for element in root.iter(*selectors_by_tag):
+        class_attr = element.get('class')
+        if not class_attr:
+            continue
+        for field, class_spec in selectors_by_tag[element.tag]:
+            if field not in matches and _class_matches(class_attr, class_spec):
+                matches[field] = element
+        if len(matches) == len(selectors):
+            break
+    return matches
+
+def _text(element: etree._Element) -> str:
+    return element.text_content().strip()
+
+
+class LxmlParser(JobPageParser):
+    """lxml based parser that finds every field of a page in a single walk of its tree"""
+
+    _find_base_card_div = etree.XPath("(.//div[contains(concat(' ', normalize-space(@class), ' '), ' base-card ')])[1]")
+    _find_base_card_link = etree.XPath("(.//a[contains(concat(' ', normalize-space(@class), ' '), ' base-card ')])[1]")
+    _job_post_selectors = {
+        'title': ('h3', 'base-search-card__title'),
+        'title_fallback': ('span', 'sr-only'),
+        'company': ('h4', 'base-search-card__subtitle'),
+        'location': ('span', 'job-search-card__location'),
+        'benefits': ('span', 'job-posting-benefits__text'),
+        'listdate': ('time', 'job-search-card__listdate'),
+        'listdate_new': ('time', 'job-search-card__listdate--new'),
+    }
+    _job_selectors = {
+        'title': ('h2', 'top-card-layout__title'),
+        'company': ('a', 'topcard__org-name-link topcard__flavor--black-link'),
+        'location': ('span', 'topcard__flavor topcard__flavor--bullet'),
+        'salary_range': ('div', 'salary compensation__salary'),
+        'time_since_posted': ('span', 'posted-time-ago__text topcard__flavor--metadata'),
+        'time_since_posted_new': ('span', 'posted-time-ago__text posted-time-ago__text--new topcard__flavor--metadata'),
+        'num_applicants': ('span', 'num-applicants__caption topcard__flavor--metadata topcard__flavor--bullet'),
+        'num_applicants_caption': ('figcaption', 'num-applicants__caption'),
+        'description': ('div', 'show-more-less-html__markup show-more-less-html__markup--clamp-after-5 relative overflow-hidden'),
+    }
+    _criteria_item_selectors = {
+        'subheader': ('h3', 'description__job-criteria-subheader'),
+        'criteria': ('span', 'description__job-criteria-text'),
+    }
+
+    def _parse_document(self, raw_html: str) -> etree._Element | None:
+        if not raw_html or not raw_html.strip():
+            return None
+        try:
+            return lxml.html.document_fromstring(raw_html)
+        except etree.ParserError:
+            return None
+
+    def _parse_job_post(self, job_post: etree._Element) -> dict | None:
+        base_cards = self._find_base_card_div(job_post) or self._find_base_card_link(job_post)
+        if not base_cards or not base_cards[0].get('data-entity-urn'):
+            return None
+        base_card = base_cards[0]
+        job_data = {'id': base_card.get('data-entity-urn').split(':')[3]}
+        fields = _first_matches(base_card, self._job_post_selectors)
+        title = fields.get('title', fields.get('title_fallback'))
+        if title is not None:
+            job_data['title'] = _text(title)
+        for field in ('company', 'location', 'benefits'):
+            if field in fields:
+                job_data[field] = _text(fields[field])
+        listdate = fields.get('listdate', fields.get('listdate_new'))
+        if listdate is not None and listdate.get('datetime') is not None:
+            job_data['date_posted'] = listdate.get('datetime')
+            job_data['time_since_posted'] = _text(listdate)
+        return job_data
+
+    def parse_listing(self, raw_listing: str) -> list[dict]:
+        root = self._parse_document(raw_listing)
+        if root is None:
+            return []
+        return self._drop_unparsed([self._parse_job_post(job_post) for job_post in root.iter('li')])
+
+    def _get_criteria_items(self, root: etree._Element) -> dict | None:
+        job_criteria_data = {}
+        for item in root.iter('li'):
+            if not _class_matches(item.get('class', ''), 'description__job-criteria-item'):
+                continue
+            fields = _first_matches(item, self._criteria_item_selectors)
+            if 'subheader' in fields and 'criteria' in fields:
+                job_criteria_data[_text(fields['subheader']).lower().replace(' ', '_')] = _text(fields['criteria'])
+        return job_criteria_data or None
+
+    def parse_job(self, raw_job: str) -> dict:
+        root = self._parse_document(raw_job)
+        if root is None:
+            return {'job_criteria_items': None}
+        fields = _first_matches(root, self._job_selectors)
+        job_content = {}
+        for field in ('title', 'company', 'location', 'salary_range'):
+            if field in fields:
+                job_content[field] = _text(fields[field])
+        job_content['job_criteria_items'] = self._get_criteria_items(root)
+        time_since_posted = fields.get('time_since_posted', fields.get('time_since_posted_new'))
+        if time_since_posted is not None:
+            job_content['time_since_posted'] = _text(time_since_posted)
+        num_applicants = fields.get('num_applicants', fields.get('num_applicants_caption'))
+        if num_applicants is not None:
+            job_content['num_applicants'] = _text(num_applicants)
+        if 'description' in fields:
+            job_content['description'] = _text(fields['description'])
+        return job_content
+
+
+PARSERS: dict[str, type[JobPageParser]] = {
+    'bs4': BeautifulSoupParser,
+    'lxml': LxmlParser,
+}
+
+def get_parser(name: str | None = None) -> JobPageParser:
+    """create the html parser backend called name, defaulting to settings.SCRAPER_PARSER"""
+    name = name or settings.SCRAPER_PARSER
+    try:
+        return PARSERS[name]()
+    except KeyError as e:
+        raise ValueError(f'unknown parser "{name}", expected one of {list(PARSERS)}') from e
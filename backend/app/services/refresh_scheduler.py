@@ -0,0 +1,121 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import timedelta
+import itertools
+from app.services.job_search_service import JobSearchService
+from app.core.config import settings
+
+@dataclass(frozen=True)
+class RefreshQuery:
+    keywords: str
+    location: str
+    max_days_since_posted: int
+    limit: int
+
+
+class RefreshScheduler:
+    """keeps the most popular searches warm in the background
+
+    Every interval the most searched queries are put on a priority queue, most popular
+    first, and a fixed number of workers re-scrape the stale jobs of each one and re-run
+    the search so its results are cached before the next user asks for them.
+    """
+
+    def __init__(
+            self,
+            interval_seconds: float,
+            stale_after: timedelta,
+            top_queries: int,
+            concurrency: int,
+            batch_size: int,
+            popularity_decay: float = 0.5
+            ):
+        self._interval_seconds = interval_seconds
+        self._stale_after = stale_after
+        self._top_queries = top_queries
+        self._concurrency = concurrency
+        self._batch_size = batch_size
+        self._popularity_decay = popularity_decay
+        self._popularity: dict[RefreshQuery, float] = {}
+        self._queue: asyncio.PriorityQueue[tuple[float, int, RefreshQuery | None]] = asyncio.PriorityQueue()
+        self._queued: set[RefreshQuery] = set()
+        self._order = itertools.count()
+        self._tasks: list[asyncio.Task] = []
+
+    def record_search(self, keywords: str, location: str, max_days_since_posted: int, limit: int):
+        query = RefreshQuery(keywords, location, max_days_since_posted, limit)
+        self._popularity[query] = self._popularity.get(query, 0.0) + 1
+
+    def _schedule_popular_queries(self):
+        popular_queries = sorted(self._popularity.items(), key=lambda item: item[1], reverse=True)[:self._top_queries]
+        for query, popularity in popular_queries:
+            if query in self._queued:
+                continue
+            self._queued.add(query)
+            self._queue.put_nowait((-popularity, next(self._order), query))
+        # older searches count for less every interval, and are dropped once they stop mattering
+        self._popularity = {
+            query: popularity * self._popularity_decay
+            for query, popularity in self._popularity.items()
+            if popularity * self._popularity_decay >= 0.1
+        }
+
+    async def _produce(self):
+        while True:
+            self._schedule_popular_queries()
+            await asyncio.sleep(self._interval_seconds)
+
+    async def refresh(self, query: RefreshQuery):
+        job_search_service = JobSearchService(
+            keywords=query.keywords,
+            location=query.location,
+            max_days_since_posted=query.max_days_since_posted,
+            limit=query.limit,
+            )
+        summary = await job_search_service.refresh_stale_jobs(stale_after=self._stale_after, limit=self._batch_size)
+        settings.logger.info(f'refreshed stale jobs for "{job_search_service.search_key}": {summary}')
+        await job_search_service.search()
+
+    async def _work(self):
+        while True:
+            _, _, query = await self._queue.get()
+            if query is None:
+                return
+            self._queued.discard(query)
+            try:
+                await self.refresh(query)
+            except Exception as e:
+                settings.logger.warning(f'failed to refresh {query}: {type(e).__name__}: {e}')
+
+    def start(self):
+        if self._tasks:
+            return
+        self._tasks = [asyncio.create_task(self._produce())]
+        self._tasks.extend(asyncio.create_task(self._work()) for _ in range(self._concurrency))
+
+    async def stop(self, timeout_seconds: float):
+        """stop scheduling, let refreshes already running finish within timeout_seconds, then cancel them"""
+        if not self._tasks:
+            return
+        producer, workers = self._tasks[0], self._tasks[1:]
+        producer.cancel()
+        # drop whatever is still queued and wake every worker up with a stop signal
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queued.clear()
+        for _ in workers:
+            self._queue.put_nowait((float('inf'), next(self._order), None))
+        _, still_running = await asyncio.wait(workers, timeout=timeout_seconds)
+        for task in still_running:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+refresh_scheduler = RefreshScheduler(
+    interval_seconds=settings.REFRESH_INTERVAL_SECONDS,
+    stale_after=timedelta(seconds=settings.REFRESH_STALE_AFTER_SECONDS),
+    top_queries=settings.REFRESH_TOP_QUERIES,
+    concurrency=settings.REFRESH_CONCURRENCY,
+    batch_size=settings.REFRESH_BATCH_SIZE,
+)
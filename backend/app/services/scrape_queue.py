@@ -0,0 +1,298 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator
+import asyncio
+import json
+from beanie import PydanticObjectId
+from beanie.odm.utils.encoder import Encoder
+from beanie.operators import In
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.models.scrape_tasks import ScrapeTask, ScrapeTaskKind, ScrapeTaskStatus
+from app.services.scraping_service import JobScrapeError
+from app.core.config import settings
+from app.core.metrics import DB_QUERY_SECONDS
+
+FINISHED_STATUSES = [ScrapeTaskStatus.DONE.value, ScrapeTaskStatus.DEAD.value]
+
+class ScrapeTaskError(Exception):
+    """raised when a queued scrape task died, or didn't finish in time"""
+
+    def __init__(self, message: str, timed_out: bool = False):
+        super().__init__(message)
+        self.timed_out = timed_out
+
+
+async def enqueue(kind: ScrapeTaskKind, params: dict[str, Any], key: str) -> PydanticObjectId:
+    """queue a scrape task, or join the pending or leased task with the same key
+
+    Args:
+        kind (ScrapeTaskKind): what to scrape
+        params (dict[str, Any]): what the worker scrapes it with
+        key (str): identical tasks share a key
+
+    Returns:
+        PydanticObjectId: id of the task
+    """
+    document = Encoder(to_db=True).encode(
+        ScrapeTask(kind=kind, params=params, key=key, active_key=key, max_attempts=settings.SCRAPE_QUEUE_MAX_ATTEMPTS)
+        )
+    for field in ('_id', 'revision_id'):
+        document.pop(field, None)
+    with DB_QUERY_SECONDS.labels('enqueue_scrape_task').time():
+        try:
+            task = await _upsert_active_task(key, document)
+        except DuplicateKeyError:
+            # another process inserted the task in between, join it
+            task = await _upsert_active_task(key, document)
+    return PydanticObjectId(task['_id'])
+
+async def _upsert_active_task(key: str, document: dict) -> dict:
+    return await ScrapeTask.get_motor_collection().find_one_and_update(
+        {'active_key': key},
+        {'$setOnInsert': document},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+        projection={'_id': 1},
+    )
+
+async def claim(worker_id: str, lease_seconds: float) -> ScrapeTask | None:
+    """lease the pending task that has been available the longest
+
+    Args:
+        worker_id (str): worker taking the lease
+        lease_seconds (float): how long the worker has to finish the task
+
+    Returns:
+        ScrapeTask | None: the leased task, None if no task is available
+    """
+    now = datetime.now(tz=timezone.utc)
+    with DB_QUERY_SECONDS.labels('claim_scrape_task').time():
+        task = await ScrapeTask.get_motor_collection().find_one_and_update(
+            {'status': ScrapeTaskStatus.PENDING.value, 'available_at': {'$lte': now}},
+            {
+                '$set': {
+                    'status': ScrapeTaskStatus.LEASED.value,
+                    'lease_owner': worker_id,
+                    'lease_expires_at': now + timedelta(seconds=lease_seconds),
+                },
+                '$inc': {'attempts': 1},
+            },
+            sort=[('available_at', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+    return ScrapeTask.model_validate(task) if task else None
+
+async def _finish_leased(task: ScrapeTask, worker_id: str, update: dict) -> bool:
+    # only the worker still holding the lease may finish the task
+    with DB_QUERY_SECONDS.labels('finish_scrape_task').time():
+        result = await ScrapeTask.get_motor_collection().update_one(
+            {'_id': task.id, 'status': ScrapeTaskStatus.LEASED.value, 'lease_owner': worker_id},
+            update,
+        )
+    return result.modified_count == 1
+
+async def complete(task: ScrapeTask, worker_id: str, result: Any) -> bool:
+    """store the result of a leased task
+
+    Returns:
+        bool: False if the lease was lost and the result discarded
+    """
+    return await _finish_leased(task, worker_id, {
+        '$set': {
+            'status': ScrapeTaskStatus.DONE.value,
+            'result': result,
+            'error': None,
+            'lease_owner': None,
+            'lease_expires_at': None,
+            'expire_at': datetime.now(tz=timezone.utc) + timedelta(seconds=settings.SCRAPE_QUEUE_DONE_TTL_SECONDS),
+        },
+        # the next task with the key can be queued
+        '$unset': {'active_key': ''},
+    })
+
+async def fail(
+        task: ScrapeTask,
+        worker_id: str,
+        error: str,
+        retryable: bool = True,
+        retry_after: float | None = None,
+        count_attempt: bool = True
+        ) -> bool:
+    """return a leased task to the queue to be retried with backoff, or dead-letter it
+    once it is out of attempts or the error can't be fixed by retrying
+
+    Args:
+        task (ScrapeTask): the failed task
+        worker_id (str): worker holding the lease
+        error (str): why the task failed
+        retryable (bool, optional): whether retrying can fix the error. Defaults to True.
+        retry_after (float | None, optional): seconds to wait before retrying, instead of the backoff. Defaults to None.
+        count_attempt (bool, optional): False if the task didn't get a fair attempt, e.g. while the
+            circuit to LinkedIn was open. Defaults to True.
+
+    Returns:
+        bool: False if the lease was lost
+    """
+    now = datetime.now(tz=timezone.utc)
+    attempts = task.attempts if count_attempt else task.attempts - 1
+    if not retryable or attempts >= task.max_attempts:
+        return await _finish_leased(task, worker_id, {
+            '$set': {
+                'status': ScrapeTaskStatus.DEAD.value,
+                'attempts': attempts,
+                'error': error,
+                'lease_owner': None,
+                'lease_expires_at': None,
+                'expire_at': now + timedelta(seconds=settings.SCRAPE_QUEUE_DEAD_TTL_SECONDS),
+            },
+            '$unset': {'active_key': ''},
+        })
+    if retry_after is None:
+        retry_after = settings.SCRAPE_QUEUE_RETRY_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0)
+    return await _finish_leased(task, worker_id, {'$set': {
+        'status': ScrapeTaskStatus.PENDING.value,
+        'attempts': attempts,
+        'error': error,
+        'available_at': now + timedelta(seconds=retry_after),
+        'lease_owner': None,
+        'lease_expires_at': None,
+    }})
+
+async def reap_expired_leases() -> int:
+    """return tasks whose worker didn't finish them within their lease to the queue,
+    dead-lettering the ones that are out of attempts
+
+    Returns:
+        int: number of tasks reaped
+    """
+    now = datetime.now(tz=timezone.utc)
+    expired_tasks = await ScrapeTask.get_motor_collection().find(
+        {'status': ScrapeTaskStatus.LEASED.value, 'lease_expires_at': {'$lt': now}},
+        projection={'attempts': 1, 'max_attempts': 1, 'lease_owner': 1},
+    ).to_list(length=None)
+    reaped = 0
+    for task in expired_tasks:
+        dead = task['attempts'] >= task['max_attempts']
+        update = {'$set': {
+            'status': (ScrapeTaskStatus.DEAD if dead else ScrapeTaskStatus.PENDING).value,
+            'error': f'lease of {task["lease_owner"]} expired',
+            'available_at': now,
+            'lease_owner': None,
+            'lease_expires_at': None,
+        }}
+        if dead:
+            update['$set']['expire_at'] = now + timedelta(seconds=settings.SCRAPE_QUEUE_DEAD_TTL_SECONDS)
+            update['$unset'] = {'active_key': ''}
+        result = await ScrapeTask.get_motor_collection().update_one(
+            # the lease may have been finished or renewed since it was found
+            {'_id': task['_id'], 'status': ScrapeTaskStatus.LEASED.value, 'lease_expires_at': {'$lt': now}},
+            update,
+        )
+        reaped += result.modified_count
+    if reaped:
+        settings.logger.warning(f'{reaped} scrape tasks reaped after their lease expired')
+    return reaped
+
+async def iter_finished_tasks(
+        task_ids: list[PydanticObjectId],
+        timeout_seconds: float,
+        poll_interval_seconds: float
+        ) -> AsyncIterator[ScrapeTask]:
+    """poll tasks until they are done or dead, yielding each one as it finishes.
+    tasks that haven't finished within timeout_seconds are left out
+    """
+    unfinished = set(task_ids)
+    deadline = asyncio.get_running_loop().time() + timeout_seconds
+    while unfinished:
+        with DB_QUERY_SECONDS.labels('poll_scrape_tasks').time():
+            finished_tasks = await ScrapeTask.find(
+                In(ScrapeTask.id, list(unfinished)),
+                In(ScrapeTask.status, FINISHED_STATUSES)
+                ).to_list()
+        for task in finished_tasks:
+            unfinished.discard(task.id)
+            yield task
+        if not unfinished or asyncio.get_running_loop().time() >= deadline:
+            return
+        await asyncio.sleep(poll_interval_seconds)
+
+
+class QueuedJobPostScraper:
+    """JobPostScraper that has the scrape workers fetch the listing"""
+
+    async def get_postings(
+            self,
+            keywords: str=None,
+            location: str=None,
+            max_days_since_posted: int=1,
+            start: int=0,
+            limit: int=10
+            ) -> list[dict]:
+        """see JobPostScraper.get_postings"""
+        listing_pages = await self.get_listing_pages(keywords, location, max_days_since_posted, start, limit)
+        return [job_post for job_posts in listing_pages for job_post in job_posts]
+
+    async def get_listing_pages(
+            self,
+            keywords: str=None,
+            location: str=None,
+            max_days_since_posted: int=1,
+            start: int=0,
+            limit: int=10
+            ) -> list[list[dict]]:
+        """queue a listing scrape and wait for its pages, see JobPostScraper.get_listing_pages
+
+        Raises:
+            ScrapeTaskError: raised when the task died or didn't finish within SCRAPE_QUEUE_WAIT_TIMEOUT_SECONDS
+
+        Returns:
+            list[list[dict]]: the job post dictionaries of each listing page
+        """
+        params = {
+            'keywords': keywords,
+            'location': location,
+            'max_days_since_posted': max_days_since_posted,
+            'start': start,
+            'limit': limit,
+        }
+        task_id = await enqueue(ScrapeTaskKind.LISTING, params, key=f'listing:{json.dumps(params, sort_keys=True)}')
+        async for task in iter_finished_tasks(
+                [task_id],
+                timeout_seconds=settings.SCRAPE_QUEUE_WAIT_TIMEOUT_SECONDS,
+                poll_interval_seconds=settings.SCRAPE_QUEUE_POLL_INTERVAL_SECONDS
+                ):
+            if task.status == ScrapeTaskStatus.DEAD:
+                raise ScrapeTaskError(f'listing scrape failed: {task.error}')
+            return task.result
+        raise ScrapeTaskError('timed out waiting for a scrape worker to fetch the listing', timed_out=True)
+
+
+class QueuedJobContentScraper:
+    """JobContentScraper that has the scrape workers fetch the job pages"""
+
+    async def get_jobs_content(self, job_ids: list[int]) -> list[dict | JobScrapeError]:
+        """see JobContentScraper.get_jobs_content"""
+        job_contents = {job_id: job_content async for job_id, job_content in self.iter_jobs_content(job_ids)}
+        return [job_contents[job_id] for job_id in job_ids]
+
+    async def iter_jobs_content(self, job_ids: list[int]) -> AsyncIterator[tuple[int, dict | JobScrapeError]]:
+        """queue a scrape of every job page and yield each one as its task finishes,
+        see JobContentScraper.iter_jobs_content
+        """
+        unique_job_ids = list(dict.fromkeys(job_ids))
+        task_ids = await asyncio.gather(
+            *[enqueue(ScrapeTaskKind.JOB, {'job_id': job_id}, key=f'job:{job_id}') for job_id in unique_job_ids]
+            )
+        job_ids_by_task_id = dict(zip(task_ids, unique_job_ids))
+        async for task in iter_finished_tasks(
+                task_ids,
+                timeout_seconds=settings.SCRAPE_QUEUE_WAIT_TIMEOUT_SECONDS,
+                poll_interval_seconds=settings.SCRAPE_QUEUE_POLL_INTERVAL_SECONDS
+                ):
+            job_id = job_ids_by_task_id.pop(task.id)
+            if task.status == ScrapeTaskStatus.DEAD:
+                yield job_id, JobScrapeError(job_id, task.error)
+            else:
+                yield job_id, task.result
+        for job_id in job_ids_by_task_id.values():
+            yield job_id, JobScrapeError(job_id, 'timed out waiting for a scrape worker')
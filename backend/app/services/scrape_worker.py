@@ -0,0 +1,80 @@
+from typing import Any
+import asyncio
+import httpx
+from app.models.scrape_tasks import ScrapeTask, ScrapeTaskKind
+from app.services.scrape_queue import claim, complete, fail, reap_expired_leases
+from app.services.scraping_service import JobContentScraper, JobPostScraper
+from app.core.circuit_breaker import CircuitOpenError
+from app.core.config import settings
+from app.core.http_client import RETRY_STATUS_CODES
+
+class ScrapeWorker:
+    """works on the scrape task queue: claims tasks, scrapes them and stores their results"""
+
+    def __init__(self, worker_id: str, concurrency: int, lease_seconds: float, poll_interval_seconds: float):
+        if concurrency <= 0:
+            raise ValueError(f'concurrency must be > 0. value: {concurrency}')
+        self.worker_id = worker_id
+        self._concurrency = concurrency
+        self._lease_seconds = lease_seconds
+        self._poll_interval_seconds = poll_interval_seconds
+        self._job_post_scraper = JobPostScraper()
+        self._job_content_scraper = JobContentScraper()
+        self._stopping = asyncio.Event()
+        self.completed = 0
+        self.failed = 0
+
+    async def run_task(self, task: ScrapeTask) -> Any:
+        if task.kind == ScrapeTaskKind.LISTING:
+            return await self._job_post_scraper.get_listing_pages(**task.params)
+        return await self._job_content_scraper.get_job_content(task.params['job_id'])
+
+    async def _run_claimed(self, task: ScrapeTask):
+        try:
+            result = await self.run_task(task)
+        except CircuitOpenError as e:
+            # LinkedIn is throttling us, not the task's fault
+            self.failed += 1
+            await fail(task, self.worker_id, str(e), retry_after=e.retry_after, count_attempt=False)
+        except httpx.HTTPStatusError as e:
+            self.failed += 1
+            await fail(task, self.worker_id, str(e), retryable=e.response.status_code in RETRY_STATUS_CODES)
+        except Exception as e:
+            self.failed += 1
+            settings.logger.warning(f'scrape task {task.id} failed: {type(e).__name__}: {e}')
+            await fail(task, self.worker_id, f'{type(e).__name__}: {e}')
+        else:
+            self.completed += 1
+            if not await complete(task, self.worker_id, result):
+                settings.logger.warning(f'lease of scrape task {task.id} was lost before it finished, result discarded')
+
+    async def _sleep_unless_stopping(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _work(self):
+        while not self._stopping.is_set():
+            task = await claim(self.worker_id, self._lease_seconds)
+            if task is None:
+                await self._sleep_unless_stopping(self._poll_interval_seconds)
+                continue
+            await self._run_claimed(task)
+
+    async def _reap(self):
+        while not self._stopping.is_set():
+            try:
+                await reap_expired_leases()
+            except Exception as e:
+                settings.logger.warning(f'failed to reap expired scrape task leases: {type(e).__name__}: {e}')
+            await self._sleep_unless_stopping(self._lease_seconds / 2)
+
+    async def run(self):
+        """work until stop is called, then finish the tasks already claimed"""
+        settings.logger.info(f'scrape worker {self.worker_id} started with concurrency {self._concurrency}')
+        await asyncio.gather(self._reap(), *[self._work() for _ in range(self._concurrency)])
+        settings.logger.info(f'scrape worker {self.worker_id} stopped: {self.completed} tasks completed, {self.failed} failed')
+
+    def stop(self):
+        self._stopping.set()
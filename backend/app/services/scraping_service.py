@@ -1,75 +1,68 @@
-import requests
-from bs4 import BeautifulSoup
-from bs4.element import ResultSet, Tag
+import asyncio
+from typing import AsyncIterator
+import httpx
+from app.core.config import settings
+from app.core.executor import worker_pool
+from app.core.metrics import PAGE_CACHE_LOOKUPS, SCRAPE_SECONDS
+from app.core.http_client import ScraperClient, get_scraper_client
+from app.services.page_cache import CachedPage, PageCache, content_hash, page_cache as default_page_cache
+from app.services.parsers import JobPageParser, get_parser
+from app.services.single_flight import SingleFlight
 
-class JobPostScraper:
-    def __init__(self):
-        self._url = 'https://www.linkedin.com/jobs-guest/jobs/api/seeMoreJobPostings/search?keywords={keywords}&location={location}&f_TPR={max_seconds_since_posted}&start={start}'
+# concurrent scrapes of the same job page, e.g. from overlapping searches, share a single request and parse
+job_content_flights: SingleFlight[dict] = SingleFlight()
 
-    def _parse_listing(self, raw_listing: str) -> ResultSet:
-        """parse raw html from LinkedIn job list page
+# postings per listing page
+LISTING_PAGE_SIZE = 10
 
-        Args:
-            raw_listing (str): raw html from LinkedIn job list page
+class JobScrapeError(Exception):
+    """raised, or returned in place of a result, when a single job could not be scraped"""
 
-        Returns:
-            ResultSet: a list-like object containing li html objects from LinkedIn job list page
-        """
-        list_soup = BeautifulSoup(raw_listing, 'html.parser')
-        parsed_listing = list_soup.find_all('li')
-        return parsed_listing
+    def __init__(self, job_id: int, message: str):
+        super().__init__(f'job {job_id}: {message}')
+        self.job_id = job_id
 
-    def _parse_job_post(self, job_post: Tag) -> dict:
-        """parse job post data out of a LinkedIn job posting
+class JobPostScraper:
+    def __init__(self, http_client: ScraperClient | None = None, parser: JobPageParser | None = None):
+        self._http_client = http_client
+        self._parser = parser or get_parser()
+        self._url = settings.SCRAPER_BASE_URL + '/jobs-guest/jobs/api/seeMoreJobPostings/search?keywords={keywords}&location={location}&f_TPR={max_seconds_since_posted}&start={start}'
 
-        Args:
-            job_post (Tag): LinkedIn job posting to be parsed
+    @property
+    def http_client(self) -> ScraperClient:
+        return self._http_client or get_scraper_client()
+
+    @staticmethod
+    def page_starts(start: int, limit: int) -> range:
+        """offsets of the listing pages get_postings requests for start and limit"""
+        limit = limit - limit%LISTING_PAGE_SIZE if limit>LISTING_PAGE_SIZE-1 else limit
+        return range(start, start + max(limit, 1), LISTING_PAGE_SIZE)
+
+    async def get_postings(
+            self,
+            keywords: str=None,
+            location: str=None,
+            max_days_since_posted: int=1,
+            start: int=0,
+            limit: int=10
+            ) -> list[dict]:
+        """scrape the job posts of the listing pages from start to limit, see get_listing_pages
 
         Returns:
-            dict: parsed job post data
+            list[dict]: a list of job post dictionaries
         """
-        job_data = {}
-        base_card_data = job_post.find('div', {'class': 'base-card'}) or job_post.find('a', {'class': 'base-card'})
-        job_data['id'] = base_card_data.get('data-entity-urn').split(':')[3]
-        try:
-            job_data['title'] = base_card_data.find('h3', {'class': 'base-search-card__title'}).text.strip()
-        except AttributeError:
-            try:
-                job_data['title'] = base_card_data.find('span', {'class': 'sr-only'}).text.strip()
-            except Exception:
-                pass # pydantic will assign it None if not provided
-        try:
-            job_data['company'] = base_card_data.find('h4', {'class': 'base-search-card__subtitle'}).text.strip()
-        except:
-            pass # pydantic will assign it None if not provided
-        try:
-            job_data['location'] = base_card_data.find('span', {'class': 'job-search-card__location'}).text.strip()
-        except:
-            pass # pydantic will assign it None if not provided
-        try:
-            job_data['benefits'] = base_card_data.find('span', {'class': 'job-posting-benefits__text'}).text.strip()
-        except:
-            pass # pydantic will assign it None if not provided
-        try:
-            job_data['date_posted'] = base_card_data.find('time', {'class': 'job-search-card__listdate'}).attrs['datetime']
-            job_data['time_since_posted'] = base_card_data.find('time', {'class': 'job-search-card__listdate'}).text.strip()
-        except AttributeError:
-            try:
-                job_data['date_posted'] = base_card_data.find('time', {'class': 'job-search-card__listdate--new'}).attrs['datetime']
-                job_data['time_since_posted'] = base_card_data.find('time', {'class': 'job-search-card__listdate--new'}).text.strip()
-            except Exception:
-                pass # pydantic will assign them None if not provided
-        return job_data
-
-    def get_postings(
+        listing_pages = await self.get_listing_pages(keywords, location, max_days_since_posted, start, limit)
+        return [job_post for job_posts in listing_pages for job_post in job_posts]
+
+    async def get_listing_pages(
             self,
             keywords: str=None,
             location: str=None,
             max_days_since_posted: int=1,
             start: int=0,
             limit: int=10
-            ) -> list[dict]:
-        """scrape a list of raw html job listings from LinkedIn
+            ) -> list[list[dict]]:
+        """scrape a list of raw html job listings from LinkedIn, page by page
 
         Args:
             keywords (list[str], optional): keywords to search for. Defaults to None.
@@ -79,125 +72,191 @@ class JobPostScraper:
 
         Raises:
             TypeError: raised on incorrect argument type
-            RequestStatusException: raised when request returns a status code outside of the 200s
+            HTTPStatusError: raised when request returns a status code outside of the 200s
+            CircuitOpenError: raised while LinkedIn is throttling us and requests fail fast
 
         Returns:
-            list[dict]: a list of job post dictionaries
+            list[list[dict]]: the job post dictionaries of each page of page_starts(start, limit), in order,
+                up to the first page that came back empty, where the listing ran out, which is last and empty.
+                pages may hold fewer than LISTING_PAGE_SIZE posts before the listing runs out
         """
-        limit = limit - limit%10 if limit>9 else limit
         max_seconds_since_posted = f'r{max_days_since_posted * 86400}'
-        parsed_job_listings = []
-        while len(parsed_job_listings) < limit:
-            url = self._url.format(
-                keywords=keywords,
-                location=location,
-                max_seconds_since_posted=max_seconds_since_posted,
-                start=start
-                )
-            resp = requests.get(url=url)
-            if 200 > resp.status_code > 299:                
-                raise requests.HTTPError(f'error {resp.status_code} - {resp.reason} - {resp.text}')
-            parsed_listing = self._parse_listing(resp.text)
-            if not parsed_listing:
-                return parsed_job_listings
-            parsed_job_listings.extend([self._parse_job_post(job_posting) for job_posting in parsed_listing])
-            start += 10
-        return parsed_job_listings
+        # listing pages start every LISTING_PAGE_SIZE postings, so all the pages needed can be requested at once
+        page_starts = self.page_starts(start, limit)
+        pages = await asyncio.gather(
+            *[
+                self._get_listing_page(
+                    self._url.format(
+                        keywords=keywords,
+                        location=location,
+                        max_seconds_since_posted=max_seconds_since_posted,
+                        start=page_start
+                        )
+                    )
+                for page_start in page_starts
+            ]
+        )
+        listing_pages = []
+        for page in pages:
+            listing_pages.append(page)
+            # an empty page means the listing ran out, later pages can't hold anything either
+            if not page:
+                break
+        return listing_pages
 
-class JobContentScraper:
-    def __init__(self):
-        self._url = 'https://www.linkedin.com/jobs-guest/jobs/api/jobPosting/{id}'
-
-    def _get_criteria_items(self, job_soup: BeautifulSoup) -> dict:
-        """extract job criteria items from a LinkedIn job
+    async def _get_listing_page(self, url: str) -> list[dict]:
+        """scrape and parse a single LinkedIn job list page
 
         Args:
-            job_soup (BeautifulSoup): a BeautifulSoup object containing html from a LinkedIn job page
-
-        Returns:
-            dict: a dictionary of job criteria items
-        """
-        job_criteria_items = job_soup.find_all('li', class_='description__job-criteria-item')
-        if job_criteria_items:
-            job_criteria_data = {}
-            for item in job_criteria_items:
-                try:
-                    subheader = item.find('h3', class_='description__job-criteria-subheader').text.strip()
-                    criteria = item.find('span', class_='description__job-criteria-text').text.strip()
-                    job_criteria_data[subheader.lower().replace(' ', '_')] = criteria
-                except:
-                    continue # don't add anything
-            if job_criteria_data:
-                return job_criteria_data
-        return None
-    
-    def _parse_job_data(self, job_soup: BeautifulSoup) -> dict:
-        """parse key data from a LinkedIn job page
+            url (str): url of the job list page
 
-        Args:
-            job_soup (BeautifulSoup): a BeautifulSoup object containing html from a LinkedIn job page
+        Raises:
+            HTTPStatusError: raised when request returns a status code outside of the 200s
 
         Returns:
-            dict: parsed job data
+            list[dict]: the job post dictionaries on the page, empty if the listing ran out
         """
-        job_content = {}
-        try:
-            job_content['title'] = job_soup.find('h2', {'class': 'top-card-layout__title'}).text.strip()
-        except:
-            pass  # pydantic will assign it None if not provided
-        try:
-            job_content['company'] = job_soup.find('a', {'class': 'topcard__org-name-link topcard__flavor--black-link'}).text.strip()
-        except:
-            pass  # pydantic will assign it None if not provided
-        try:
-            job_content['location'] = job_soup.find('span', {'class': 'topcard__flavor topcard__flavor--bullet'}).text.strip()
-        except:
-            pass  # pydantic will assign it None if not provided
-        try:
-            job_content['salary_range'] = job_soup.find('div', {'class': 'salary compensation__salary'}).text.strip()
-        except:
-            pass  # pydantic will assign it None if not provided
+        with SCRAPE_SECONDS.labels('listing').time():
+            resp = await self.http_client.get(url)
+            if not resp.is_success:
+                raise httpx.HTTPStatusError(f'error {resp.status_code} - {resp.reason_phrase} - {resp.text}', request=resp.request, response=resp)
+            return await worker_pool.run(self._parser.parse_listing, resp.text)
 
-        # self._get_criteria_items handles exceptions
-        job_content['job_criteria_items'] = self._get_criteria_items(job_soup)
+class JobContentScraper:
+    def __init__(
+            self,
+            http_client: ScraperClient | None = None,
+            parser: JobPageParser | None = None,
+            page_cache: PageCache | None = None
+            ):
+        self._http_client = http_client
+        self._parser = parser or get_parser()
+        self._parser_name = type(self._parser).__name__
+        self._page_cache = page_cache
+        self._url = settings.SCRAPER_BASE_URL + '/jobs-guest/jobs/api/jobPosting/{id}'
 
-        try:
-            job_content['time_since_posted'] = job_soup.find('span', {'class': 'posted-time-ago__text topcard__flavor--metadata'}).text.strip()
-        except AttributeError:
-            try:
-                job_content['time_since_posted'] = job_soup.find('span', {'class': 'posted-time-ago__text posted-time-ago__text--new topcard__flavor--metadata'}).text.strip()
-            except:
-                pass  # pydantic will assign it None if not provided
-        try:
-            job_content['num_applicants'] = job_soup.find('span', {'class': 'num-applicants__caption topcard__flavor--metadata topcard__flavor--bullet'}).text.strip()
-        except AttributeError:
-            try:
-                job_content['num_applicants'] = job_soup.find('figcaption', {'class': 'num-applicants__caption'}).text.strip()
-            except:
-                pass  # pydantic will assign it None if not provided
-        try:
-            job_content['description'] = job_soup.find('div', {'class': 'show-more-less-html__markup show-more-less-html__markup--clamp-after-5 relative overflow-hidden'}).text.strip()
-        except:
-            pass  # pydantic will assign it None if not provided
-        return job_content
+    @property
+    def http_client(self) -> ScraperClient:
+        return self._http_client or get_scraper_client()
 
-    def get_job_content(self, job_id: int) -> dict:
-        """scrape job content from a linkedin job page
+    @property
+    def page_cache(self) -> PageCache | None:
+        if self._page_cache is not None:
+            return self._page_cache
+        return default_page_cache if settings.PAGE_CACHE_ENABLED else None
+
+    async def get_job_content(self, job_id: int) -> dict:
+        """scrape job content from a linkedin job page,
+        sharing the scrape already in flight for the same job if there is one
 
         Args:
             job_id (int): linkedin job id
 
         Raises:
-            RequestStatusException: raised when request returns a status code outside of the 200s
+            HTTPStatusError: raised when request returns a status code outside of the 200s
 
         Returns:
             dict: parsed job data
         """
+        job_content = await job_content_flights.do(
+            f'{self._parser_name}:{job_id}',
+            lambda: self._get_job_content(job_id)
+            )
+        # every caller sharing the scrape gets a dict of its own
+        return dict(job_content)
+
+    async def _get_job_content(self, job_id: int) -> dict:
         url = self._url.format(id=job_id)
-        resp = requests.get(url)
-        if 200 > resp.status_code > 299:                
-            raise requests.HTTPError(f'error {resp.status_code} - {resp.reason} - {resp.text}')
-        job_soup = BeautifulSoup(resp.text, 'html.parser')
-        job_content = self._parse_job_data(job_soup)
+        with SCRAPE_SECONDS.labels('job').time():
+            cached_page = await self.page_cache.get(str(job_id)) if self.page_cache is not None else None
+            job_content = None
+            if cached_page is not None and cached_page.is_fresh(self.page_cache.fresh_seconds):
+                job_content = await self._parse_cached_page(cached_page)
+                if job_content is not None:
+                    PAGE_CACHE_LOOKUPS.labels('fresh').inc()
+            if job_content is None:
+                job_content = await self._fetch_job_content(url, str(job_id), cached_page)
         job_content.update({'job_id': job_id})
         return job_content
+
+    async def _fetch_job_content(self, url: str, key: str, cached_page: CachedPage | None) -> dict:
+        """fetch and parse a job page, revalidating the cached copy if there is one
+        and reusing what it parsed to if the page hasn't changed
+        """
+        headers = cached_page.conditional_headers() if cached_page else {}
+        resp = await self.http_client.get(url, headers=headers)
+        if cached_page is not None and (
+                resp.status_code == 304
+                or (resp.is_success and content_hash(resp.text) == cached_page.content_hash)
+                ):
+            job_content = await self._parse_cached_page(cached_page)
+            if job_content is not None:
+                PAGE_CACHE_LOOKUPS.labels('not_modified' if resp.status_code == 304 else 'unchanged').inc()
+                await self.page_cache.revalidated(cached_page, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+                return job_content
+            if resp.status_code == 304:
+                # the cached copy was evicted in the meantime
+                resp = await self.http_client.get(url)
+        if not resp.is_success:
+            raise httpx.HTTPStatusError(f'error {resp.status_code} - {resp.reason_phrase} - {resp.text}', request=resp.request, response=resp)
+        job_content = await worker_pool.run(self._parser.parse_job, resp.text)
+        if self.page_cache is not None:
+            PAGE_CACHE_LOOKUPS.labels('changed' if cached_page else 'miss').inc()
+            page = await self.page_cache.put(key, resp.text, resp.headers.get('ETag'), resp.headers.get('Last-Modified'))
+            await self.page_cache.put_parsed(page, self._parser_name, job_content)
+        return job_content
+
+    async def _parse_cached_page(self, cached_page: CachedPage) -> dict | None:
+        """the parsed content of a cached page, parsing it only if this parser hasn't before.
+        None if the page has been evicted
+        """
+        job_content = await self.page_cache.read_parsed(cached_page, self._parser_name)
+        if job_content is None:
+            raw_job = await self.page_cache.read(cached_page)
+            if raw_job is None:
+                return None
+            job_content = await worker_pool.run(self._parser.parse_job, raw_job)
+            await self.page_cache.put_parsed(cached_page, self._parser_name, job_content)
+        return job_content
+
+    async def get_jobs_content(self, job_ids: list[int]) -> list[dict | JobScrapeError]:
+        """scrape job content for many linkedin job pages concurrently
+
+        Args:
+            job_ids (list[int]): linkedin job ids
+
+        Returns:
+            list[dict | JobScrapeError]: parsed job data in the same order as job_ids,
+                with a JobScrapeError in place of every job that could not be scraped
+        """
+        return await asyncio.gather(*[self._get_job_content_or_error(job_id) for job_id in job_ids])
+
+    async def _get_job_content_or_error(self, job_id: int) -> dict | JobScrapeError:
+        try:
+            return await self.get_job_content(job_id)
+        except Exception as e:
+            error = JobScrapeError(job_id, f'{type(e).__name__}: {e}')
+            error.__cause__ = e
+            return error
+
+    async def iter_jobs_content(self, job_ids: list[int]) -> AsyncIterator[tuple[int, dict | JobScrapeError]]:
+        """scrape job content for many linkedin job pages concurrently, yielding each
+        job as soon as it has been scraped
+
+        Args:
+            job_ids (list[int]): linkedin job ids
+
+        Yields:
+            tuple[int, dict | JobScrapeError]: the job id and its parsed job data,
+                or a JobScrapeError if the job could not be scraped
+        """
+        tasks = [asyncio.ensure_future(self._get_job_content_or_error(job_id)) for job_id in job_ids]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                job_content = await next_done
+                job_id = job_content.job_id if isinstance(job_content, JobScrapeError) else job_content['job_id']
+                yield job_id, job_content
+        finally:
+            # the consumer may stop early, don't leave requests running in the background
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,162 @@
+from collections import Counter
+from datetime import datetime, timezone
+import math
+import re
+import unicodedata
+from app.models.jobs import Job
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9][a-z0-9+#]*')
+STOP_WORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it',
+    'of', 'on', 'or', 'our', 'that', 'the', 'this', 'to', 'we', 'will', 'with', 'you', 'your',
+})
+# how much a token counts for, depending on the field it was found in
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'company': 2.0,
+    'job_criteria_items': 1.5,
+    'description': 1.0,
+}
+# bm25 parameters
+K1 = 1.2
+B = 0.75
+
+def _stem(token: str) -> str:
+    # plural -> singular is enough to match "engineers" with "engineer"
+    if len(token) > 4 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+def tokenize(text: str | None) -> list[str]:
+    """lowercase, strip accents and split text into stemmed tokens, dropping stop words"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return [_stem(token) for token in TOKEN_PATTERN.findall(text) if token not in STOP_WORDS]
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+class JobSearchIndex:
+    """in-memory inverted index over the text of scraped jobs, ranked with bm25"""
+
+    def __init__(self):
+        # token -> job_id -> field weighted term frequency
+        self._postings: dict[str, dict[int, float]] = {}
+        # job_id -> the tokens it is indexed under, so it can be removed without scanning every posting
+        self._doc_tokens: dict[int, tuple[str, ...]] = {}
+        self._doc_lengths: dict[int, float] = {}
+        self._location_tokens: dict[int, frozenset[str]] = {}
+        self._date_posted: dict[int, datetime | None] = {}
+        self._total_doc_length = 0.0
+        self.ready = False
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def __contains__(self, job_id: int) -> bool:
+        return job_id in self._doc_lengths
+
+    @staticmethod
+    def _field_texts(job: Job) -> dict[str, str | None]:
+        criteria = job.job_criteria_items.model_dump() if job.job_criteria_items else {}
+        return {
+            'title': job.title,
+            'company': job.company,
+            'job_criteria_items': ' '.join(str(value) for value in criteria.values() if value),
+            'description': job.description,
+        }
+
+    def add(self, job: Job):
+        """index a job, replacing whatever was indexed for its job_id before"""
+        self.remove(job.job_id)
+        term_frequencies: Counter[str] = Counter()
+        for field, text in self._field_texts(job).items():
+            for token in tokenize(text):
+                term_frequencies[token] += FIELD_WEIGHTS[field]
+        for token, term_frequency in term_frequencies.items():
+            self._postings.setdefault(token, {})[job.job_id] = term_frequency
+        self._doc_tokens[job.job_id] = tuple(term_frequencies)
+        doc_length = sum(term_frequencies.values())
+        self._doc_lengths[job.job_id] = doc_length
+        self._total_doc_length += doc_length
+        self._location_tokens[job.job_id] = frozenset(tokenize(job.location))
+        self._date_posted[job.job_id] = _as_utc(job.date_posted)
+
+    def remove(self, job_id: int):
+        doc_length = self._doc_lengths.pop(job_id, None)
+        if doc_length is None:
+            return
+        self._total_doc_length -= doc_length
+        del self._location_tokens[job_id]
+        del self._date_posted[job_id]
+        for token in self._doc_tokens.pop(job_id):
+            del self._postings[token][job_id]
+            if not self._postings[token]:
+                del self._postings[token]
+
+    def search(
+            self,
+            keywords: str,
+            location: str = '',
+            posted_after: datetime | None = None,
+            limit: int = 10,
+            exclude_job_ids: set[int] | frozenset[int] = frozenset()
+            ) -> list[int]:
+        """find the jobs matching every keyword, best match first
+
+        Args:
+            keywords (str): every token must appear in the job's title, company, criteria or description
+            location (str, optional): every token must appear in the job's location. Defaults to ''.
+            posted_after (datetime | None, optional): only return jobs posted at or after this. Defaults to None.
+            limit (int, optional): max number of job ids to return. Defaults to 10.
+            exclude_job_ids (set[int], optional): job ids to leave out of the results. Defaults to frozenset().
+
+        Returns:
+            list[int]: matching job ids ranked by bm25 score
+        """
+        query_tokens = set(tokenize(keywords))
+        if not query_tokens or not all(token in self._postings for token in query_tokens):
+            return []
+        # intersect starting from the rarest token, it bounds the candidates
+        ordered_tokens = sorted(query_tokens, key=lambda token: len(self._postings[token]))
+        candidates = set(self._postings[ordered_tokens[0]])
+        for token in ordered_tokens[1:]:
+            candidates &= self._postings[token].keys()
+        candidates -= exclude_job_ids
+        location_tokens = set(tokenize(location))
+        if location_tokens:
+            candidates = {job_id for job_id in candidates if location_tokens <= self._location_tokens[job_id]}
+        if posted_after is not None:
+            posted_after = _as_utc(posted_after)
+            candidates = {
+                job_id for job_id in candidates
+                if self._date_posted[job_id] is not None and self._date_posted[job_id] >= posted_after
+            }
+        if not candidates:
+            return []
+
+        doc_count = len(self._doc_lengths)
+        average_doc_length = self._total_doc_length / doc_count or 1.0
+        scores = dict.fromkeys(candidates, 0.0)
+        for token in query_tokens:
+            postings = self._postings[token]
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for job_id in candidates:
+                term_frequency = postings[job_id]
+                length_norm = 1 - B + B * self._doc_lengths[job_id] / average_doc_length
+                scores[job_id] += idf * term_frequency * (K1 + 1) / (term_frequency + K1 * length_norm)
+        return sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
+
+    async def build(self):
+        """index every job in the database"""
+        async for job in Job.find_all():
+            self.add(job)
+        self.ready = True
+
+
+job_search_index = JobSearchIndex()
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+from app.models.search_keys import ScrapeFrontier, SearchKey
+from app.core.config import settings
+from app.core.metrics import DB_QUERY_SECONDS
+
+async def get_search_key(key: str) -> SearchKey | None:
+    with DB_QUERY_SECONDS.labels('get_search_key').time():
+        return await SearchKey.find_one(SearchKey.key == key)
+
+async def count_search(key: str, answered_by_db: bool):
+    """count a search of key, and whether the db answered it without scraping"""
+    with DB_QUERY_SECONDS.labels('count_search').time():
+        await SearchKey.get_motor_collection().update_one(
+            {'key': key},
+            {'$inc': {'search_count': 1, 'db_hit_count': int(answered_by_db)}},
+            upsert=True,
+        )
+
+async def record_listing_scrape(
+        key: str,
+        max_days_since_posted: int,
+        pages_scraped: int,
+        listing_exhausted: bool
+        ):
+    """record how deep into the listing of key a scrape stored every job
+
+    Args:
+        key (str): search key scraped
+        max_days_since_posted (int): max_days_since_posted of the listing
+        pages_scraped (int): listing pages from the start of the listing whose jobs are all stored
+        listing_exhausted (bool): whether the listing ran out, with the jobs of every page before it stored
+    """
+    now = datetime.now(tz=timezone.utc)
+    fresh_cutoff = now - timedelta(seconds=settings.SEARCH_KEY_FRESH_SECONDS)
+    # depth builds up across scrapes of the same listing while they are recent, otherwise it starts over.
+    # decided in the same update that writes the depth, so a concurrent scrape of another posting window
+    # can't slip in between and have its depth recorded for this one
+    starts_over = {'$or': [
+        {'$ne': ['$scraped_max_days_since_posted', max_days_since_posted]},
+        # missing sorts before any date
+        {'$lt': ['$last_scraped_at', fresh_cutoff]},
+    ]}
+    with DB_QUERY_SECONDS.labels('record_listing_scrape').time():
+        await SearchKey.get_motor_collection().update_one(
+            {'key': key},
+            [{'$set': {
+                'scraped_max_days_since_posted': max_days_since_posted,
+                # a concurrent scrape that got less deep can't lower what another one recorded
+                'pages_scraped': {'$cond': [starts_over, pages_scraped, {'$max': ['$pages_scraped', pages_scraped]}]},
+                'listing_exhausted': {
+                    '$cond': [starts_over, listing_exhausted, {'$max': ['$listing_exhausted', listing_exhausted]}]
+                },
+                'last_scraped_at': {'$max': ['$last_scraped_at', now]},
+                'scrape_count': {'$add': [{'$ifNull': ['$scrape_count', 0]}, 1]},
+            }}],
+            upsert=True,
+        )
+
+async def get_scrape_frontier(key: str, max_days_since_posted: int) -> ScrapeFrontier | None:
+    with DB_QUERY_SECONDS.labels('get_scrape_frontier').time():
+        return await ScrapeFrontier.find_one(
+            ScrapeFrontier.search_key == key,
+            ScrapeFrontier.max_days_since_posted == max_days_since_posted
+            )
+
+async def advance_scrape_frontier(
+        key: str,
+        max_days_since_posted: int,
+        stored_pages: dict[int, int],
+        end_offset: int | None
+        ):
+    """record the listing pages a scrape fetched and stored every job of
+
+    Args:
+        key (str): search key scraped
+        max_days_since_posted (int): max_days_since_posted of the listing
+        stored_pages (dict[int, int]): offset of each page whose jobs are all stored -> how many postings it held
+        end_offset (int | None): offset of the first page found empty, None if the listing didn't run out
+    """
+    now = datetime.now(tz=timezone.utc)
+    update = {}
+    for offset, postings in stored_pages.items():
+        update[f'fetched_pages.{offset}'] = now
+        update[f'page_postings.{offset}'] = postings
+    if end_offset is not None:
+        update[f'fetched_pages.{end_offset}'] = now
+        update['end_offset'] = end_offset
+        update['end_fetched_at'] = now
+    if not update:
+        return
+    frontier_filter = {'search_key': key, 'max_days_since_posted': max_days_since_posted}
+    with DB_QUERY_SECONDS.labels('advance_scrape_frontier').time():
+        await ScrapeFrontier.get_motor_collection().update_one(frontier_filter, {'$set': update}, upsert=True)
+        if end_offset is None and stored_pages:
+            # the listing has grown past where it ended before
+            await ScrapeFrontier.get_motor_collection().update_one(
+                {**frontier_filter, 'end_offset': {'$lte': max(stored_pages)}},
+                {'$unset': {'end_offset': '', 'end_fetched_at': ''}},
+            )
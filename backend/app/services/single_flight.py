@@ -0,0 +1,43 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, TypeVar
+
+T = TypeVar('T')
+
+class SingleFlight(Generic[T]):
+    """runs at most one call per key at a time, concurrent callers with the same key
+    wait for and share the result of the call already in flight
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task[T]] = {}
+        self.calls = 0
+        self.shared_calls = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """run fn, or join the call already in flight for key
+
+        Args:
+            key (str): calls with equal keys are deduplicated
+            fn (Callable[[], Awaitable[T]]): coroutine function to run if no call is in flight
+
+        Returns:
+            T: the result of the call, shared by every caller that joined it
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done_task: self._forget(key, done_task))
+        else:
+            self.shared_calls += 1
+        # one caller going away must not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task[T]):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -1,6 +1,18 @@
 from fastapi import HTTPException
+import uuid
 from app.models.users import User, UserCreate
+from app.core.config import settings
+from app.core.executor import worker_pool
+from app.core.metrics import DB_QUERY_SECONDS, track_cache
 from app.core.security import get_password_hash, verify_password
+from app.services.cache import CacheBackend, InMemoryCache
+
+# verified users keyed on str(user_id), read on every authenticated request
+user_cache: CacheBackend[User] = InMemoryCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS
+)
+track_cache('user', user_cache)
 
 class UserService:
     
@@ -12,15 +24,29 @@ class UserService:
             )
         user = User(
             username=user_create.username,
-            hashed_password=get_password_hash(user_create.password)
+            hashed_password=await worker_pool.run(get_password_hash, user_create.password)
         )
         await User.insert_one(user)
+        await self.invalidate_user(user.user_id)
+        return user
+
+    async def get_by_user_id(self, user_id: uuid.UUID) -> User | None:
+        user = await user_cache.get(str(user_id))
+        if user is None:
+            with DB_QUERY_SECONDS.labels('get_user').time():
+                user = await User.find_one(User.user_id == user_id)
+            if user:
+                await user_cache.set(str(user_id), user)
         return user
 
+    async def invalidate_user(self, user_id: uuid.UUID):
+        """drop a user from the cache, must be called whenever a user is created or changed"""
+        await user_cache.delete(str(user_id))
+
     async def authenticate(self, username: str, password: str) -> User | None:
         user: User = await User.find_one(User.username == username)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await worker_pool.run(verify_password, password, user.hashed_password):
             return None
         return user
@@ -0,0 +1,253 @@
+"""end-to-end api load test against a local Mongo and LinkedIn stand-in
+
+Run from backend/ with the packages in benchmarks/requirements.txt installed:
+
+    python -m benchmarks.load_test --users 50 --duration 30 --mix search=1 list=4 login=1
+
+Boots the FastAPI app from main.py with uvicorn in a background thread, backed by an
+in-memory Mongo stand-in (or --mongo-uri) and the LinkedIn stand-in server. Virtual
+users then call /jobs/search, /jobs/list and /login/access-token in the given mix.
+Reports throughput, tail latency and the app's event-loop lag per endpoint as json.
+A lag sample counts towards every endpoint that had a request in flight when it was taken.
+The in-memory Mongo stand-in does its work on the app's event loop, so lag numbers only
+reflect production when run against a real Mongo with --mongo-uri.
+"""
+import argparse
+import asyncio
+from collections import Counter
+from dataclasses import dataclass, field
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017')
+
+import httpx
+import uvicorn
+from app.core.config import settings
+from benchmarks.run import percentile
+from benchmarks.stand_in_server import LinkedInStandIn
+
+ENDPOINTS = ('search', 'list', 'login')
+PASSWORD = 'load-test-password'
+
+@dataclass
+class EndpointStats:
+    latencies: list[float] = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)
+    loop_lags: list[float] = field(default_factory=list)
+
+    def report(self, elapsed: float) -> dict:
+        return {
+            'requests': len(self.latencies),
+            'errors': dict(self.errors),
+            'requests_per_second': len(self.latencies) / elapsed,
+            'latency_p50_ms': percentile(self.latencies, 50) * 1000,
+            'latency_p95_ms': percentile(self.latencies, 95) * 1000,
+            'latency_p99_ms': percentile(self.latencies, 99) * 1000,
+            'latency_max_ms': max(self.latencies, default=0.0) * 1000,
+            'loop_lag_p50_ms': percentile(self.loop_lags, 50) * 1000,
+            'loop_lag_p99_ms': percentile(self.loop_lags, 99) * 1000,
+            'loop_lag_max_ms': max(self.loop_lags, default=0.0) * 1000,
+        }
+
+
+class AppServer:
+    """runs main.app with uvicorn on its own event loop in a background thread,
+    and measures how late that loop wakes up from a short sleep
+    """
+
+    def __init__(self, mongo_uri: str | None, lag_interval_seconds: float, in_flight: Counter):
+        self._mongo_uri = mongo_uri
+        self._lag_interval_seconds = lag_interval_seconds
+        self._in_flight = in_flight
+        self.loop_lags: list[tuple[float, tuple[str, ...]]] = []
+        with socket.socket() as free_socket:
+            free_socket.bind(('127.0.0.1', 0))
+            self.port = free_socket.getsockname()[1]
+        self._server: uvicorn.Server | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.port}'
+
+    async def _probe_loop_lag(self):
+        while True:
+            started_at = time.perf_counter()
+            await asyncio.sleep(self._lag_interval_seconds)
+            lag = time.perf_counter() - started_at - self._lag_interval_seconds
+            busy_endpoints = tuple(endpoint for endpoint, count in list(self._in_flight.items()) if count)
+            self.loop_lags.append((lag, busy_endpoints))
+
+    async def _serve(self):
+        import main
+        if self._mongo_uri:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            main.db = AsyncIOMotorClient(self._mongo_uri)[f'jobs_load_test_{int(time.time())}']
+        else:
+            from mongomock_motor import AsyncMongoMockClient
+            main.db = AsyncMongoMockClient()['jobs_load_test']
+        self._server = uvicorn.Server(
+            uvicorn.Config(main.app, host='127.0.0.1', port=self.port, log_level='warning', lifespan='on')
+        )
+        probe = asyncio.create_task(self._probe_loop_lag())
+        try:
+            await self._server.serve()
+        finally:
+            probe.cancel()
+            if self._mongo_uri:
+                await main.db.client.drop_database(main.db.name)
+
+    def start(self, timeout_seconds: float = 30.0):
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(),), daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout_seconds
+        while not (self._server and self._server.started):
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError('the app did not start')
+            time.sleep(0.05)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join()
+
+
+class LoadTest:
+    def __init__(self, args: argparse.Namespace, base_url: str, in_flight: Counter):
+        self._args = args
+        self._base_url = base_url + settings.API_V1_STR
+        self._in_flight = in_flight
+        self._endpoints = list(args.mix)
+        self._weights = [args.mix[endpoint] for endpoint in self._endpoints]
+        self._queries = [f'load test query {number}' for number in range(args.queries)]
+        self.stats = {endpoint: EndpointStats() for endpoint in self._endpoints}
+
+    async def _login(self, client: httpx.AsyncClient, username: str) -> httpx.Response:
+        return await client.post(
+            f'{self._base_url}/login/access-token',
+            data={'username': username, 'password': PASSWORD},
+        )
+
+    async def create_users(self, client: httpx.AsyncClient) -> list[tuple[str, str]]:
+        """sign up one user per virtual user and log each in, returns (username, token) pairs"""
+        users = []
+        for number in range(self._args.users):
+            username = f'load-test-user-{number}'
+            resp = await client.post(f'{self._base_url}/users/signup', json={'username': username, 'password': PASSWORD})
+            if resp.status_code not in (200, 400):
+                resp.raise_for_status()
+            resp = await self._login(client, username)
+            resp.raise_for_status()
+            users.append((username, resp.json()['access_token']))
+        return users
+
+    async def _request(self, client: httpx.AsyncClient, endpoint: str, username: str, token: str) -> httpx.Response:
+        headers = {'Authorization': f'Bearer {token}'}
+        if endpoint == 'search':
+            params = {'keywords': random.choice(self._queries), 'limit': self._args.search_limit}
+            return await client.get(f'{self._base_url}/jobs/search', params=params, headers=headers)
+        if endpoint == 'list':
+            return await client.get(f'{self._base_url}/jobs/list', params={'limit': 20}, headers=headers)
+        return await self._login(client, username)
+
+    async def _virtual_user(self, client: httpx.AsyncClient, username: str, token: str, deadline: float):
+        while time.monotonic() < deadline:
+            endpoint = random.choices(self._endpoints, self._weights)[0]
+            stats = self.stats[endpoint]
+            self._in_flight[endpoint] += 1
+            started_at = time.perf_counter()
+            try:
+                resp = await self._request(client, endpoint, username, token)
+                if resp.status_code >= 400:
+                    stats.errors[str(resp.status_code)] += 1
+            except httpx.HTTPError as e:
+                stats.errors[type(e).__name__] += 1
+            finally:
+                self._in_flight[endpoint] -= 1
+            stats.latencies.append(time.perf_counter() - started_at)
+
+    async def run(self) -> float:
+        limits = httpx.Limits(max_connections=self._args.users)
+        async with httpx.AsyncClient(limits=limits, timeout=self._args.timeout) as client:
+            users = await self.create_users(client)
+            started_at = time.monotonic()
+            deadline = started_at + self._args.duration
+            await asyncio.gather(*[self._virtual_user(client, username, token, deadline) for username, token in users])
+            return time.monotonic() - started_at
+
+
+def parse_mix(values: list[str]) -> dict[str, float]:
+    mix = {}
+    for value in values:
+        endpoint, _, weight = value.partition('=')
+        if endpoint not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f'unknown endpoint "{endpoint}", expected one of {ENDPOINTS}')
+        mix[endpoint] = float(weight or 1)
+    return mix
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds to run the load for')
+    parser.add_argument('--mix', nargs='+', default=['search=1', 'list=4', 'login=1'], help='endpoint=weight pairs')
+    parser.add_argument('--queries', type=int, default=10, help='distinct searches the users pick from')
+    parser.add_argument('--search-limit', type=int, default=20)
+    parser.add_argument('--server-latency-ms', type=float, default=50.0, help='delay the LinkedIn stand-in adds to every response')
+    parser.add_argument('--lag-interval-ms', type=float, default=10.0, help='how often the app event loop lag is sampled')
+    parser.add_argument('--timeout', type=float, default=60.0, help='client request timeout in seconds')
+    parser.add_argument('--mongo-uri', default=None, help='use this mongo instead of an in-memory stand-in')
+    parser.add_argument('--output', default=None, help='write results to this file instead of stdout')
+    args = parser.parse_args(argv)
+    args.mix = parse_mix(args.mix)
+    return args
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    # query plans can't be explained by the stand-in, and background refreshes or pages cached by an earlier run would skew results
+    settings.CHECK_QUERY_PLANS_ON_STARTUP = bool(args.mongo_uri)
+    settings.REFRESH_ENABLED = False
+    settings.PAGE_CACHE_ENABLED = False
+    settings.SCRAPER_RATE_LIMIT_PER_HOST = 1_000_000.0
+    in_flight: Counter = Counter()
+    stand_in = LinkedInStandIn(total_jobs=100_000, latency_seconds=args.server_latency_ms / 1000).start()
+    settings.SCRAPER_BASE_URL = stand_in.base_url
+    app_server = AppServer(args.mongo_uri, args.lag_interval_ms / 1000, in_flight)
+    app_server.start()
+    load_test = LoadTest(args, app_server.base_url, in_flight)
+    try:
+        lag_samples_before = len(app_server.loop_lags)
+        elapsed = asyncio.run(load_test.run())
+        loop_lags = app_server.loop_lags[lag_samples_before:]
+    finally:
+        app_server.stop()
+        stand_in.stop()
+    for lag, busy_endpoints in loop_lags:
+        for endpoint in busy_endpoints:
+            load_test.stats[endpoint].loop_lags.append(lag)
+    all_lags = [lag for lag, _ in loop_lags]
+    results = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'mongo_uri')},
+        'elapsed_seconds': elapsed,
+        'requests_per_second': sum(len(stats.latencies) for stats in load_test.stats.values()) / elapsed,
+        'loop_lag_p99_ms': percentile(all_lags, 99) * 1000,
+        'loop_lag_max_ms': max(all_lags, default=0.0) * 1000,
+        'endpoints': {endpoint: stats.report(elapsed) for endpoint, stats in load_test.stats.items()},
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    for endpoint, report in results['endpoints'].items():
+        print(f'{endpoint}: {report["requests_per_second"]:.1f} req/s, p99 {report["latency_p99_ms"]:.0f} ms, loop lag p99 {report["loop_lag_p99_ms"]:.1f} ms', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
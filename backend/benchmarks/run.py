@@ -0,0 +1,229 @@
+"""scraper benchmarks, replayed against a local LinkedIn stand-in server
+
+Run from backend/ with the packages in benchmarks/requirements.txt installed:
+
+    python -m benchmarks.run --output bench.json
+
+Reports pages/sec, jobs/sec, p50/p99 request latency and peak traced memory for
+JobPostScraper, JobContentScraper and the full JobSearchService.search path, as
+json so runs can be compared across commits. The search benchmark uses an
+in-memory Mongo stand-in unless --mongo-uri is given.
+"""
+import argparse
+import asyncio
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Awaitable, Callable
+
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017')
+
+import httpx
+from app.core.config import settings
+from app.core.executor import worker_pool
+from app.core.http_client import ScraperClient
+from app.core.rate_limit import HostRateLimiter
+from benchmarks.stand_in_server import LinkedInStandIn, LISTING_PATH
+
+def percentile(values: list[float], q: float) -> float:
+    """nearest-rank percentile, q between 0 and 100"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+class TimedScraperClient(ScraperClient):
+    """ScraperClient that records the latency of every listing and job page request"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.listing_latencies: list[float] = []
+        self.job_latencies: list[float] = []
+
+    def reset(self):
+        self.listing_latencies.clear()
+        self.job_latencies.clear()
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        started_at = time.perf_counter()
+        resp = await super().get(url, **kwargs)
+        latencies = self.listing_latencies if LISTING_PATH in url else self.job_latencies
+        latencies.append(time.perf_counter() - started_at)
+        return resp
+
+
+def create_client(args: argparse.Namespace) -> TimedScraperClient:
+    rate_limiter = HostRateLimiter(args.rate_limit, args.rate_limit_burst) if args.rate_limit else None
+    return TimedScraperClient(
+        httpx.AsyncClient(limits=httpx.Limits(max_connections=args.max_in_flight)),
+        max_connections_per_host=args.max_in_flight,
+        max_in_flight=args.max_in_flight,
+        rate_limiter=rate_limiter,
+    )
+
+async def measure(
+        client: TimedScraperClient,
+        iterations: int,
+        run_iteration: Callable[[int], Awaitable[int]]
+        ) -> dict:
+    """time iterations of run_iteration, which returns the number of jobs it produced,
+    then run one more under tracemalloc to find its peak memory
+    """
+    client.reset()
+    jobs = 0
+    started_at = time.perf_counter()
+    for iteration in range(iterations):
+        jobs += await run_iteration(iteration)
+    elapsed = time.perf_counter() - started_at
+    pages = len(client.listing_latencies) + len(client.job_latencies)
+    latencies = client.listing_latencies + client.job_latencies
+
+    tracemalloc.start()
+    await run_iteration(iterations)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'iterations': iterations,
+        'elapsed_seconds': elapsed,
+        'pages': pages,
+        'jobs': jobs,
+        'pages_per_second': pages / elapsed,
+        'jobs_per_second': jobs / elapsed,
+        'latency_p50_ms': percentile(latencies, 50) * 1000,
+        'latency_p99_ms': percentile(latencies, 99) * 1000,
+        'peak_memory_bytes': peak_memory,
+    }
+
+async def bench_job_post_scraper(client: TimedScraperClient, args: argparse.Namespace) -> dict:
+    from app.services.scraping_service import JobPostScraper
+    scraper = JobPostScraper(http_client=client)
+
+    async def run_iteration(iteration: int) -> int:
+        return len(await scraper.get_postings(keywords=f'bench {iteration}', location='', limit=args.jobs))
+
+    return await measure(client, args.iterations, run_iteration)
+
+async def bench_job_content_scraper(client: TimedScraperClient, args: argparse.Namespace) -> dict:
+    from app.services.scraping_service import JobContentScraper
+    scraper = JobContentScraper(http_client=client)
+
+    async def run_iteration(iteration: int) -> int:
+        first_job_id = iteration * args.jobs
+        job_contents = await scraper.get_jobs_content(list(range(first_job_id, first_job_id + args.jobs)))
+        return sum(1 for job_content in job_contents if isinstance(job_content, dict))
+
+    return await measure(client, args.iterations, run_iteration)
+
+async def init_database(mongo_uri: str | None):
+    from beanie import init_beanie
+    from app.models.jobs import Job
+    from app.models.links import JobUserLink
+    from app.models.scrape_tasks import ScrapeTask
+    from app.models.search_keys import ScrapeFrontier, SearchKey
+    from app.models.users import User
+    if mongo_uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        database = AsyncIOMotorClient(mongo_uri)[f'jobs_bench_{int(time.time())}']
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        database = AsyncMongoMockClient()['jobs_bench']
+    await init_beanie(database=database, document_models=[Job, User, JobUserLink, SearchKey, ScrapeFrontier, ScrapeTask])
+    return database
+
+async def bench_search(client: TimedScraperClient, args: argparse.Namespace) -> dict:
+    import app.core.http_client as http_client
+    from app.services.job_search_service import JobSearchService, search_cache
+    database = await init_database(args.mongo_uri)
+    http_client._scraper_client = client
+    search_latencies: list[float] = []
+
+    async def run_iteration(iteration: int) -> int:
+        # a keyword nothing has been stored under yet, whose listing holds jobs of its own,
+        # so every search scrapes its listing and every job page
+        await search_cache.clear()
+        started_at = time.perf_counter()
+        jobs = await JobSearchService(keywords=f'bench search {iteration}', limit=args.jobs).search()
+        search_latencies.append(time.perf_counter() - started_at)
+        return len(jobs)
+
+    try:
+        result = await measure(client, args.iterations, run_iteration)
+    finally:
+        http_client._scraper_client = None
+        if args.mongo_uri:
+            await database.client.drop_database(database.name)
+    search_latencies = search_latencies[:args.iterations]
+    result['search_latency_p50_ms'] = percentile(search_latencies, 50) * 1000
+    result['search_latency_p99_ms'] = percentile(search_latencies, 99) * 1000
+    return result
+
+BENCHMARKS = {
+    'job_post_scraper': bench_job_post_scraper,
+    'job_content_scraper': bench_job_content_scraper,
+    'job_search_service': bench_search,
+}
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args: argparse.Namespace) -> dict:
+    settings.SCRAPER_PARSER = args.parser
+    settings.SEARCH_INDEX_ENABLED = False
+    settings.PAGE_CACHE_ENABLED = False
+    results = {}
+    with LinkedInStandIn(total_jobs=args.jobs * (args.iterations + 1), latency_seconds=args.server_latency_ms / 1000) as server:
+        settings.SCRAPER_BASE_URL = server.base_url
+        for name in args.benchmarks:
+            client = create_client(args)
+            try:
+                results[name] = await BENCHMARKS[name](client, args)
+            finally:
+                await client.aclose()
+            print(f'{name}: {results[name]["pages_per_second"]:.1f} pages/s, {results[name]["jobs_per_second"]:.1f} jobs/s', file=sys.stderr)
+    worker_pool.shutdown()
+    return {
+        'commit': git_commit(),
+        'timestamp': datetime.now(tz=timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'mongo_uri')},
+        'results': results,
+    }
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=100, help='jobs requested per iteration')
+    parser.add_argument('--parser', choices=['bs4', 'lxml'], default=settings.SCRAPER_PARSER)
+    parser.add_argument('--max-in-flight', type=int, default=settings.SCRAPER_MAX_IN_FLIGHT)
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='requests per second, 0 for no rate limit')
+    parser.add_argument('--rate-limit-burst', type=int, default=settings.SCRAPER_RATE_LIMIT_BURST)
+    parser.add_argument('--server-latency-ms', type=float, default=0.0, help='delay the stand-in adds to every response')
+    parser.add_argument('--mongo-uri', default=None, help='run the search benchmark against this mongo instead of an in-memory stand-in')
+    parser.add_argument('--output', default=None, help='write results to this file instead of stdout')
+    return parser.parse_args(argv)
+
+def main(argv: list[str] | None = None):
+    args = parse_args(argv)
+    results = asyncio.run(run(args))
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+import itertools
+import re
+import threading
+import time
+import zlib
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+LISTING_PATH = '/jobs-guest/jobs/api/seeMoreJobPostings/search'
+JOB_PATH_PREFIX = '/jobs-guest/jobs/api/jobPosting/'
+JOB_ID_PATTERN = re.compile(r'urn:li:jobPosting:\d+')
+DATE_POSTED_PATTERN = re.compile(r'datetime="\d{4}-\d{2}-\d{2}"')
+FIRST_JOB_ID = 4000000000
+# listings of different keywords are numbered from different ranges of job ids
+KEYWORD_ID_RANGES = 100_000
+
+class LinkedInStandIn:
+    """local http server that replays recorded LinkedIn guest api pages
+
+    Every listing page is fixtures/listing.html with its job ids renumbered from the
+    requested keywords and start offset, so pages never repeat and the listings of
+    different keywords never share jobs, and its postings dated today,
+    until total_jobs have been listed and empty pages are returned. Every job page
+    is fixtures/job.html.
+    """
+
+    def __init__(
+            self,
+            total_jobs: int = 1000,
+            latency_seconds: float = 0.0,
+            fixtures_dir: Path = FIXTURES_DIR,
+            host: str = '127.0.0.1',
+            port: int = 0
+            ):
+        self.total_jobs = total_jobs
+        self.latency_seconds = latency_seconds
+        self.listing_html = (fixtures_dir / 'listing.html').read_text()
+        self.job_html = (fixtures_dir / 'job.html').read_text().encode()
+        self.requests_served = 0
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def first_job_id(self, keywords: str) -> int:
+        return FIRST_JOB_ID + zlib.crc32(keywords.encode()) % KEYWORD_ID_RANGES * self.total_jobs
+
+    def render_listing(self, start: int, keywords: str = '') -> bytes:
+        if start >= self.total_jobs:
+            return b''
+        job_ids = itertools.count(self.first_job_id(keywords) + start)
+        listing_html = JOB_ID_PATTERN.sub(lambda _: f'urn:li:jobPosting:{next(job_ids)}', self.listing_html)
+        today = datetime.now(tz=timezone.utc).date().isoformat()
+        return DATE_POSTED_PATTERN.sub(f'datetime="{today}"', listing_html).encode()
+
+    def _make_handler(self) -> type[BaseHTTPRequestHandler]:
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                if stand_in.latency_seconds:
+                    time.sleep(stand_in.latency_seconds)
+                url = urlsplit(self.path)
+                if url.path == LISTING_PATH:
+                    query = parse_qs(url.query)
+                    start = int(query.get('start', ['0'])[0])
+                    body = stand_in.render_listing(start, keywords=query.get('keywords', [''])[0])
+                elif url.path.startswith(JOB_PATH_PREFIX):
+                    body = stand_in.job_html
+                else:
+                    self.send_error(404)
+                    return
+                stand_in.requests_served += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> 'LinkedInStandIn':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> 'LinkedInStandIn':
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
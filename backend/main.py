@@ -3,11 +3,21 @@ from contextlib import asynccontextmanager
 from beanie import init_beanie
 from motor.motor_asyncio import AsyncIOMotorClient
 from fastapi import FastAPI
+from prometheus_client import make_asgi_app
 from app.api.routes import api_router
 from app.models.jobs import Job
 from app.models.users import User
+from app.models.search_keys import ScrapeFrontier, SearchKey
 from app.models.links import JobUserLink
+from app.models.scrape_tasks import ScrapeTask
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.executor import worker_pool
+from app.core.http_client import start_scraper_client, close_scraper_client
+from app.core.migrations import remove_duplicate_job_ids
+from app.core.query_plans import log_collection_scans
+from app.services.refresh_scheduler import refresh_scheduler
+from app.services.search_index import job_search_index
 
 MONGO_URI = settings.MONGO_URI
 
@@ -19,15 +29,32 @@ db = client['jobs_db']
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # the unique job_id index can't be built while duplicates are stored
+    await remove_duplicate_job_ids(db)
     await init_beanie(
         database=db,  
         document_models=[
             Job,
             User,
-            JobUserLink
+            JobUserLink,
+            SearchKey,
+            ScrapeFrontier,
+            ScrapeTask
         ],
     )
+    if settings.CHECK_QUERY_PLANS_ON_STARTUP:
+        await log_collection_scans()
+    if settings.SEARCH_INDEX_ENABLED:
+        await job_search_index.build()
+        settings.logger.info(f'{len(job_search_index)} jobs indexed for full-text search')
+    worker_pool.start()
+    await start_scraper_client()
+    if settings.REFRESH_ENABLED:
+        refresh_scheduler.start()
     yield
+    await refresh_scheduler.stop(timeout_seconds=settings.REFRESH_SHUTDOWN_TIMEOUT_SECONDS)
+    await close_scraper_client()
+    worker_pool.shutdown()
 
 app = FastAPI(
     title='Job Search API',
@@ -36,7 +63,14 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.RESPONSE_COMPRESSION_MIN_BYTES,
+    compresslevel=settings.RESPONSE_GZIP_LEVEL,
+    brotli_quality=settings.RESPONSE_BROTLI_QUALITY
+)
 app.include_router(router=api_router)
+app.mount('/metrics', make_asgi_app())
 
 if __name__ == "__main__":
     import uvicorn
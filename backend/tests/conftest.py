@@ -0,0 +1,89 @@
+import os
+# settings need a mongo uri to load, the tests run against mongomock
+os.environ.setdefault('MONGO_URI', 'mongodb://localhost:27017')
+
+from datetime import datetime, timezone
+import itertools
+import re
+import httpx
+import pytest
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+from app.models.jobs import Job
+from app.models.links import JobUserLink
+from app.models.scrape_tasks import ScrapeTask
+from app.models.search_keys import ScrapeFrontier, SearchKey
+from app.models.users import User
+from app.core.config import settings
+from app.core.http_client import ScraperClient
+from app.services.job_search_service import search_cache
+import app.core.http_client as http_client
+from benchmarks.stand_in_server import DATE_POSTED_PATTERN, FIXTURES_DIR, JOB_ID_PATTERN, JOB_PATH_PREFIX, LISTING_PATH
+
+LISTING_ITEM_PATTERN = re.compile(r'<li>.*?</li>', re.DOTALL)
+
+class FakeLinkedIn:
+    """replays the benchmark fixtures through an httpx mock transport, see benchmarks.stand_in_server
+
+    listing pages are numbered from their start offset until total_jobs have been listed,
+    pages in short_pages only hold as many postings as given, job pages in failing_job_ids fail to connect
+    """
+
+    def __init__(self, total_jobs: int = 30):
+        self.total_jobs = total_jobs
+        self.short_pages: dict[int, int] = {}
+        self.failing_job_ids: set[int] = set()
+        self.listing_requests = 0
+        self.job_requests = 0
+        self.listing_html = (FIXTURES_DIR / 'listing.html').read_text()
+        self.job_html = (FIXTURES_DIR / 'job.html').read_text()
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == LISTING_PATH:
+            self.listing_requests += 1
+            start = int(request.url.params.get('start', 0))
+            if start >= self.total_jobs:
+                return httpx.Response(200, text='')
+            job_ids = itertools.count(start)
+            listing_html = JOB_ID_PATTERN.sub(lambda _: f'urn:li:jobPosting:{next(job_ids)}', self.listing_html)
+            if start in self.short_pages:
+                job_posts = LISTING_ITEM_PATTERN.findall(listing_html)
+                listing_html = ''.join(job_posts[:self.short_pages[start]])
+            today = datetime.now(tz=timezone.utc).date().isoformat()
+            return httpx.Response(200, text=DATE_POSTED_PATTERN.sub(f'datetime="{today}"', listing_html))
+        if request.url.path.startswith(JOB_PATH_PREFIX):
+            self.job_requests += 1
+            if int(request.url.path.removeprefix(JOB_PATH_PREFIX)) in self.failing_job_ids:
+                raise httpx.ConnectError('connection refused', request=request)
+            return httpx.Response(200, text=self.job_html)
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.fixture
+async def database(monkeypatch):
+    monkeypatch.setattr(settings, 'PAGE_CACHE_ENABLED', False)
+    monkeypatch.setattr(settings, 'SEARCH_INDEX_ENABLED', False)
+    database = AsyncMongoMockClient()['jobs_test']
+    await init_beanie(
+        database=database,
+        document_models=[Job, User, JobUserLink, SearchKey, ScrapeFrontier, ScrapeTask]
+    )
+    await search_cache.clear()
+    yield database
+    await search_cache.clear()
+
+@pytest.fixture
+async def linkedin(monkeypatch):
+    fake_linkedin = FakeLinkedIn()
+    client = ScraperClient(
+        httpx.AsyncClient(transport=httpx.MockTransport(fake_linkedin.handle)),
+        max_connections_per_host=10,
+        max_in_flight=10
+    )
+    monkeypatch.setattr(http_client, '_scraper_client', client)
+    yield fake_linkedin
+    await client.aclose()
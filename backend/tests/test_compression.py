@@ -0,0 +1,53 @@
+import gzip
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+import httpx
+from prometheus_client import make_asgi_app
+from app.core.compression import CompressionMiddleware
+
+pytestmark = pytest.mark.anyio
+
+BODY = 'job ' * 1000
+
+@pytest.fixture
+async def client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+
+    @app.get('/text')
+    async def text():
+        return PlainTextResponse(BODY)
+
+    @app.get('/gzipped')
+    async def gzipped():
+        return PlainTextResponse(gzip.compress(BODY.encode()), headers={'Content-Encoding': 'gzip'})
+
+    app.mount('/metrics', make_asgi_app())
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test', follow_redirects=True) as client:
+        yield client
+
+async def test_gzips_when_brotli_not_accepted(client):
+    resp = await client.get('/text', headers={'Accept-Encoding': 'gzip'})
+
+    assert resp.headers['content-encoding'] == 'gzip'
+    assert resp.text == BODY
+
+async def test_brotli_when_accepted(client):
+    resp = await client.get('/text', headers={'Accept-Encoding': 'gzip, br'})
+
+    assert resp.headers['content-encoding'] == 'br'
+    assert resp.text == BODY
+
+@pytest.mark.parametrize('accept_encoding', ['gzip', 'gzip, br'])
+async def test_already_encoded_response_passed_through(client, accept_encoding):
+    resp = await client.get('/gzipped', headers={'Accept-Encoding': accept_encoding})
+
+    assert resp.headers.get_list('content-encoding') == ['gzip']
+    assert resp.text == BODY
+
+async def test_metrics_gzipped_once(client):
+    resp = await client.get('/metrics', headers={'Accept-Encoding': 'gzip'})
+
+    assert resp.headers.get_list('content-encoding') == ['gzip']
+    assert resp.text.startswith('# HELP')
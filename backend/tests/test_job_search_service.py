@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from beanie.operators import In
+from app.models.jobs import Job
+from app.models.search_keys import SearchKey
+from app.core.config import settings
+from app.services.job_search_service import JobSearchService, search_cache
+from app.services.search_key_service import get_scrape_frontier, get_search_key, record_listing_scrape
+
+pytestmark = pytest.mark.anyio
+
+async def test_search_scrapes_and_caches(database, linkedin):
+    jobs = await JobSearchService(keywords='python', location='nyc', limit=10).search()
+
+    assert [job.job_id for job in jobs] == list(range(10))
+    assert await search_cache.get(JobSearchService(keywords='python', location='nyc', limit=10).cache_key) is not None
+
+async def test_search_with_failed_job_pages_is_not_cached(database, linkedin):
+    linkedin.failing_job_ids = {3}
+    search = JobSearchService(keywords='python', location='nyc', limit=10)
+
+    jobs = await search.search()
+
+    assert len(jobs) == 9
+    assert await search_cache.get(search.cache_key) is None
+
+async def test_listing_coverage_only_counts_stored_pages(database, linkedin):
+    linkedin.failing_job_ids = {13}
+
+    await JobSearchService(keywords='python', location='nyc', limit=20).search()
+
+    search_key = await get_search_key(JobSearchService(keywords='python', location='nyc').search_key)
+    assert search_key.pages_scraped == 1
+    assert not search_key.listing_exhausted
+
+async def test_searches_differing_in_case_and_whitespace_share_their_key(database, linkedin):
+    await JobSearchService(keywords=' Python  Developer', location='New York ', limit=10).search()
+    listing_requests = linkedin.listing_requests
+
+    jobs = await JobSearchService(keywords='python developer', location='new york', limit=20).search()
+
+    assert sorted(job.job_id for job in jobs) == list(range(20))
+    # the first page is stored under the same key, only the second one is fetched
+    assert linkedin.listing_requests == listing_requests + 1
+    search_key = await get_search_key('python developernew york')
+    assert search_key.search_count == 2
+
+async def test_short_listing_page_does_not_end_the_listing(database, linkedin):
+    linkedin.total_jobs = 300
+    linkedin.short_pages = {0: 4, 10: 4, 20: 4}
+
+    jobs = await JobSearchService(keywords='python', location='nyc', limit=30).search()
+
+    assert len(jobs) == 12
+    search_key = await get_search_key(JobSearchService(keywords='python', location='nyc').search_key)
+    assert search_key.pages_scraped == 3
+    assert not search_key.listing_exhausted
+    listing_requests = linkedin.listing_requests
+
+    jobs = await JobSearchService(keywords='python', location='nyc', limit=50).search()
+
+    assert len(jobs) > 12
+    assert linkedin.listing_requests > listing_requests
+
+async def test_short_listing_page_before_the_end(database, linkedin):
+    linkedin.short_pages = {10: 4}
+
+    jobs = await JobSearchService(keywords='python', location='nyc', limit=40).search()
+
+    assert len(jobs) == 24
+    search_key = await get_search_key(JobSearchService(keywords='python', location='nyc').search_key)
+    assert search_key.pages_scraped == 3
+    assert search_key.listing_exhausted
+
+async def test_listing_coverage_is_never_lowered(database):
+    await record_listing_scrape('pythonnyc', max_days_since_posted=1, pages_scraped=3, listing_exhausted=False)
+    await record_listing_scrape('pythonnyc', max_days_since_posted=1, pages_scraped=1, listing_exhausted=False)
+
+    search_key = await get_search_key('pythonnyc')
+    assert search_key.pages_scraped == 3
+    assert search_key.scrape_count == 2
+
+async def test_listing_coverage_starts_over_for_another_posting_window(database):
+    await record_listing_scrape('pythonnyc', max_days_since_posted=1, pages_scraped=3, listing_exhausted=True)
+    await record_listing_scrape('pythonnyc', max_days_since_posted=7, pages_scraped=1, listing_exhausted=False)
+
+    search_key = await get_search_key('pythonnyc')
+    assert search_key.scraped_max_days_since_posted == 7
+    assert search_key.pages_scraped == 1
+    assert not search_key.listing_exhausted
+
+async def test_listing_coverage_starts_over_once_stale(database):
+    await record_listing_scrape('pythonnyc', max_days_since_posted=1, pages_scraped=3, listing_exhausted=True)
+    stale_scraped_at = datetime.now(tz=timezone.utc) - timedelta(seconds=settings.SEARCH_KEY_FRESH_SECONDS + 1)
+    await SearchKey.get_motor_collection().update_one({'key': 'pythonnyc'}, {'$set': {'last_scraped_at': stale_scraped_at}})
+
+    await record_listing_scrape('pythonnyc', max_days_since_posted=1, pages_scraped=1, listing_exhausted=False)
+
+    search_key = await get_search_key('pythonnyc')
+    assert search_key.pages_scraped == 1
+    assert not search_key.listing_exhausted
+    assert search_key.scrape_count == 2
+
+async def test_failed_job_pages_are_scraped_again(database, linkedin):
+    linkedin.failing_job_ids = {3}
+    await JobSearchService(keywords='python', location='nyc', limit=20).search()
+    linkedin.failing_job_ids = set()
+
+    jobs = await JobSearchService(keywords='python', location='nyc', limit=20).search()
+
+    assert sorted(job.job_id for job in jobs) == list(range(20))
+
+async def test_frontier_skips_stored_pages(database, linkedin):
+    await JobSearchService(keywords='python', location='nyc', limit=10).search()
+    listing_requests = linkedin.listing_requests
+
+    jobs = await JobSearchService(keywords='python', location='nyc', limit=20).search()
+
+    assert sorted(job.job_id for job in jobs) == list(range(20))
+    # only the second page is fetched
+    assert linkedin.listing_requests == listing_requests + 1
+
+async def test_frontier_pages_whose_jobs_are_gone_are_scraped_again(database, linkedin):
+    await JobSearchService(keywords='python', location='nyc', limit=10).search()
+    await Job.find(In(Job.job_id, list(range(10)))).delete()
+
+    jobs = await JobSearchService(keywords='python', location='nyc', limit=20).search()
+
+    assert sorted(job.job_id for job in jobs) == list(range(20))
+
+async def test_frontier_continues_after_short_pages(database, linkedin):
+    linkedin.total_jobs = 300
+    linkedin.short_pages = {0: 4, 10: 4, 20: 4}
+    await JobSearchService(keywords='python', location='nyc', limit=30).search()
+    listing_requests = linkedin.listing_requests
+
+    jobs = await JobSearchService(keywords='python', location='nyc', limit=50).search()
+
+    # the pages holding jobs 30 to 59 are fetched, the short pages are not fetched again
+    assert len(jobs) == 42
+    assert linkedin.listing_requests == listing_requests + 3
+    frontier = await get_scrape_frontier(JobSearchService(keywords='python', location='nyc').search_key, 1)
+    assert frontier.end_offset is None
+    assert set(frontier.fetched_pages) == {'0', '10', '20', '30', '40', '50'}
+    assert frontier.page_postings['10'] == 4
+
+async def test_frontier_end_is_the_page_that_came_back_empty(database, linkedin):
+    linkedin.short_pages = {10: 4}
+
+    await JobSearchService(keywords='python', location='nyc', limit=40).search()
+
+    frontier = await get_scrape_frontier(JobSearchService(keywords='python', location='nyc').search_key, 1)
+    assert frontier.end_offset == 30
+    assert set(frontier.fetched_pages) == {'0', '10', '20', '30'}
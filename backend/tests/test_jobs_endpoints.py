@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta, timezone
+import json
+import uuid
+import pytest
+from fastapi import FastAPI
+import httpx
+from app.api.deps import get_current_user
+from app.api.endpoints import jobs
+from app.models.jobs import Job
+from app.models.links import JobUserLink
+from app.models.users import User
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def api(database, linkedin):
+    app = FastAPI()
+    app.include_router(jobs.router, prefix='/jobs')
+    user = User.model_construct(user_id=uuid.uuid4(), username='tester')
+    app.dependency_overrides[get_current_user] = lambda: user
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        client.user = user
+        yield client
+
+@pytest.fixture
+async def job(database):
+    job = Job(
+        job_id=42,
+        title='Engineer',
+        company='Acme',
+        description='builds things',
+        search_keys=['pythonnyc'],
+        last_updated=datetime(2026, 10, 1, tzinfo=timezone.utc)
+    )
+    await job.insert()
+    return job
+
+async def test_stream_search_ndjson(api):
+    resp = await api.get('/jobs/search/stream', params={'keywords': 'python', 'location': 'nyc', 'limit': 5})
+
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('application/x-ndjson')
+    streamed_jobs = [json.loads(line) for line in resp.text.splitlines()]
+    assert len(streamed_jobs) == 5
+    assert len({job['job_id'] for job in streamed_jobs}) == 5
+    assert await JobUserLink.find(JobUserLink.user_id == api.user.user_id).count() == 5
+
+async def test_stream_search_sse(api):
+    resp = await api.get(
+        '/jobs/search/stream',
+        params={'keywords': 'python', 'location': 'nyc', 'limit': 5, 'stream_format': 'sse'}
+    )
+
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('text/event-stream')
+    events = resp.text.strip().split('\n\n')
+    job_events = [json.loads(event.removeprefix('data: ')) for event in events if event.startswith('data: ')]
+    assert len(job_events) == 5
+    assert events[-1] == 'event: end\ndata: {"count": 5}'
+
+async def test_stream_search_rejects_unknown_format(api):
+    resp = await api.get('/jobs/search/stream', params={'keywords': 'python', 'stream_format': 'xml'})
+
+    assert resp.status_code == 422
+
+async def test_list_jobs_pages_through_job_summaries(api):
+    await api.get('/jobs/search', params={'keywords': 'python', 'location': 'nyc', 'limit': 10})
+
+    first_page = (await api.get('/jobs/list', params={'limit': 6})).json()
+    second_page = (await api.get('/jobs/list', params={'limit': 6, 'cursor': first_page['next_cursor']})).json()
+
+    assert len(first_page['data']) == 6
+    assert len(second_page['data']) == 4
+    assert second_page['next_cursor'] is None
+    summaries = first_page['data'] + second_page['data']
+    assert len({summary['job_id'] for summary in summaries}) == 10
+    assert set(summaries[0]) == {'job_id', 'title', 'company', 'location'}
+    assert all(summary['title'] for summary in summaries)
+
+async def test_get_job_sparse_fields(api, job):
+    resp = await api.get('/jobs/42', params={'fields': 'title, job_link'})
+
+    assert resp.status_code == 200
+    assert resp.json() == {'title': 'Engineer', 'job_link': 'https://www.linkedin.com/jobs/view/42'}
+
+@pytest.mark.parametrize('fields', ['title,salary', 'revision_id', 'id'])
+async def test_get_job_unknown_fields(api, job, fields):
+    resp = await api.get('/jobs/42', params={'fields': fields})
+
+    assert resp.status_code == 422
+
+async def test_search_sparse_fields(api):
+    resp = await api.get('/jobs/search', params={'keywords': 'python', 'limit': 10, 'fields': 'job_id,company'})
+
+    assert resp.status_code == 200
+    assert len(resp.json()) == 10
+    assert all(set(job) == {'job_id', 'company'} for job in resp.json())
+
+async def test_search_unknown_fields(api):
+    resp = await api.get('/jobs/search', params={'keywords': 'python', 'fields': 'title,revision_id'})
+
+    assert resp.status_code == 422
+
+async def test_get_job_etag(api, job):
+    resp = await api.get('/jobs/42')
+
+    assert resp.status_code == 200
+    assert resp.json()['description'] == 'builds things'
+    assert resp.headers['etag'].startswith('W/"42-')
+    assert resp.headers['cache-control'] == 'no-cache'
+    # sparse fieldsets are the same job, so they share its etag
+    assert (await api.get('/jobs/42', params={'fields': 'title'})).headers['etag'] == resp.headers['etag']
+
+@pytest.mark.parametrize('if_none_match', [
+    lambda etag: etag,
+    lambda etag: etag.removeprefix('W/'),
+    lambda etag: f'"other", {etag}',
+    lambda etag: '*',
+], ids=['weak', 'strong', 'list', 'any'])
+async def test_get_job_not_modified(api, job, if_none_match):
+    etag = (await api.get('/jobs/42')).headers['etag']
+
+    resp = await api.get('/jobs/42', headers={'If-None-Match': if_none_match(etag)})
+
+    assert resp.status_code == 304
+    assert resp.content == b''
+    assert resp.headers['etag'] == etag
+
+async def test_get_job_modified_since_etag(api, job):
+    etag = (await api.get('/jobs/42')).headers['etag']
+    await Job.find_one(Job.job_id == 42).update({'$set': {'last_updated': job.last_updated + timedelta(hours=1)}})
+
+    resp = await api.get('/jobs/42', headers={'If-None-Match': etag})
+
+    assert resp.status_code == 200
+    assert resp.headers['etag'] != etag
+    assert resp.json()['title'] == 'Engineer'
+
+async def test_get_missing_job(api):
+    resp = await api.get('/jobs/7')
+
+    assert resp.status_code == 404
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+from app.models.jobs import Job
+from app.core.migrations import remove_duplicate_job_ids
+
+pytestmark = pytest.mark.anyio
+
+async def test_remove_duplicate_job_ids_keeps_the_latest_document():
+    database = AsyncMongoMockClient()['jobs_migration_test']
+    now = datetime.now(tz=timezone.utc)
+    await database['Job'].insert_many([
+        {'job_id': 1, 'title': 'old', 'search_keys': ['a'], 'last_updated': now - timedelta(days=1)},
+        {'job_id': 1, 'title': 'new', 'search_keys': ['b'], 'last_updated': now},
+        {'job_id': 1, 'title': 'older', 'search_keys': ['a', 'c'], 'last_updated': now - timedelta(days=2)},
+        {'job_id': 2, 'title': 'only', 'search_keys': ['a'], 'last_updated': now},
+    ])
+
+    assert await remove_duplicate_job_ids(database) == 2
+
+    job = await database['Job'].find_one({'job_id': 1})
+    assert job['title'] == 'new'
+    assert sorted(job['search_keys']) == ['a', 'b', 'c']
+    assert await database['Job'].count_documents({}) == 2
+    # the unique index builds over what is left
+    await init_beanie(database=database, document_models=[Job])
+    assert await remove_duplicate_job_ids(database) == 0
@@ -0,0 +1,36 @@
+import asyncio
+import pytest
+from app.services.page_cache import PageCache
+
+pytestmark = pytest.mark.anyio
+
+def stored_bytes(page_cache: PageCache) -> int:
+    return sum(path.stat().st_size for path in page_cache.directory.rglob('*.gz'))
+
+async def test_identical_pages_parsed_at_once_are_counted_once(tmp_path):
+    page_cache = PageCache(tmp_path, max_bytes=10_000_000, fresh_seconds=60)
+    pages = await asyncio.gather(*[page_cache.put(f'job:{job_id}', '<html>same page</html>') for job_id in range(5)])
+
+    await asyncio.gather(*[page_cache.put_parsed(page, 'lxml', {'title': 'same page'}) for page in pages])
+
+    assert page_cache.size == stored_bytes(page_cache)
+    assert not list(tmp_path.rglob('*.tmp'))
+
+async def test_unchanged_page_reuses_stored_parse(tmp_path):
+    page_cache = PageCache(tmp_path, max_bytes=10_000_000, fresh_seconds=60)
+    page = await page_cache.put('job:1', '<html>page</html>')
+    await page_cache.put_parsed(page, 'lxml', {'title': 'page'})
+
+    refetched_page = await page_cache.put('job:1', '<html>page</html>')
+
+    assert await page_cache.read_parsed(refetched_page, 'lxml') == {'title': 'page'}
+    assert page_cache.size == stored_bytes(page_cache)
+
+async def test_eviction_keeps_size_in_step_with_disk(tmp_path):
+    page_cache = PageCache(tmp_path, max_bytes=200, fresh_seconds=60)
+    for job_id in range(10):
+        page = await page_cache.put(f'job:{job_id}', f'<html>page {job_id} {"x" * job_id}</html>')
+        await page_cache.put_parsed(page, 'lxml', {'job_id': job_id})
+
+    assert page_cache.size == stored_bytes(page_cache)
+    assert page_cache.size <= 200 or page_cache.page_count == 1
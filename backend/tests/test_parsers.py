@@ -0,0 +1,47 @@
+import pytest
+from app.services.parsers import PARSERS, BeautifulSoupParser, LxmlParser, get_parser
+from benchmarks.stand_in_server import FIXTURES_DIR
+
+LISTING_HTML = (FIXTURES_DIR / 'listing.html').read_text()
+JOB_HTML = (FIXTURES_DIR / 'job.html').read_text()
+# a job page LinkedIn has pulled most of the content from
+SPARSE_JOB_HTML = '<html><body><h2 class="top-card-layout__title">Engineer</h2></body></html>'
+
+def test_every_parser_is_compared():
+    assert set(PARSERS.values()) == {BeautifulSoupParser, LxmlParser}
+
+def test_parsers_parse_listings_identically():
+    postings = BeautifulSoupParser().parse_listing(LISTING_HTML)
+
+    assert len(postings) == 10
+    assert LxmlParser().parse_listing(LISTING_HTML) == postings
+
+def test_parsers_skip_listing_items_without_a_job_card(caplog):
+    # LinkedIn mixes items that aren't job postings, or have no job id, into some listings
+    listing_html = (
+        '<li><div class="see-more-jobs">see more jobs</div></li>'
+        + LISTING_HTML
+        + '<li><div class="base-card"><h3 class="base-search-card__title">No id</h3></div></li>'
+    )
+    postings = BeautifulSoupParser().parse_listing(listing_html)
+
+    assert postings == BeautifulSoupParser().parse_listing(LISTING_HTML)
+    assert LxmlParser().parse_listing(listing_html) == postings
+    assert 'skipped 2 listing items without a job card' in caplog.text
+
+def test_unknown_parser():
+    with pytest.raises(ValueError, match='unknown parser') as exc_info:
+        get_parser('html5lib')
+
+    assert isinstance(exc_info.value.__cause__, KeyError)
+
+@pytest.mark.parametrize('job_html', [JOB_HTML, SPARSE_JOB_HTML, ''], ids=['full', 'sparse', 'empty'])
+def test_parsers_parse_jobs_identically(job_html):
+    assert LxmlParser().parse_job(job_html) == BeautifulSoupParser().parse_job(job_html)
+
+def test_parsed_job_has_its_content():
+    job = LxmlParser().parse_job(JOB_HTML)
+
+    assert job['title']
+    assert job['company']
+    assert job['description']
@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from pymongo.errors import DuplicateKeyError
+from app.models.scrape_tasks import ScrapeTask, ScrapeTaskKind, ScrapeTaskStatus
+from app.core.config import settings
+from app.services import scrape_queue
+from app.services.scrape_worker import ScrapeWorker
+from app.services.scraping_service import JobScrapeError
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def queue(database, monkeypatch):
+    monkeypatch.setattr(settings, 'SCRAPE_QUEUE_MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(settings, 'SCRAPE_QUEUE_RETRY_BACKOFF_SECONDS', 0)
+    monkeypatch.setattr(settings, 'SCRAPE_QUEUE_POLL_INTERVAL_SECONDS', 0.01)
+    monkeypatch.setattr(settings, 'SCRAPE_QUEUE_WAIT_TIMEOUT_SECONDS', 5)
+    return database
+
+async def enqueue_job(job_id: int):
+    return await scrape_queue.enqueue(ScrapeTaskKind.JOB, {'job_id': job_id}, key=f'job:{job_id}')
+
+async def test_enqueue_joins_the_active_task_with_the_same_key(queue):
+    task_ids = await asyncio.gather(*[enqueue_job(1) for _ in range(5)])
+
+    assert len(set(task_ids)) == 1
+    assert await ScrapeTask.count() == 1
+
+async def test_enqueue_queues_again_once_the_task_finished(queue):
+    first_task_id = await enqueue_job(1)
+    task = await scrape_queue.claim('worker', lease_seconds=60)
+    await scrape_queue.complete(task, 'worker', {'job_id': 1})
+
+    assert await enqueue_job(1) != first_task_id
+
+async def test_only_one_active_task_per_key(queue):
+    await enqueue_job(1)
+
+    with pytest.raises(DuplicateKeyError):
+        await ScrapeTask(kind=ScrapeTaskKind.JOB, params={'job_id': 1}, key='job:1', active_key='job:1').insert()
+
+async def test_claim_leases_the_task_once(queue):
+    task_id = await enqueue_job(1)
+
+    task = await scrape_queue.claim('worker-1', lease_seconds=60)
+
+    assert task.id == task_id
+    assert task.status == ScrapeTaskStatus.LEASED
+    assert task.lease_owner == 'worker-1'
+    assert task.attempts == 1
+    assert await scrape_queue.claim('worker-2', lease_seconds=60) is None
+
+async def test_only_the_lease_owner_finishes_the_task(queue):
+    await enqueue_job(1)
+    task = await scrape_queue.claim('worker-1', lease_seconds=60)
+
+    assert not await scrape_queue.complete(task, 'worker-2', {'job_id': 1})
+    assert await scrape_queue.complete(task, 'worker-1', {'job_id': 1})
+    task = await ScrapeTask.get(task.id)
+    assert task.status == ScrapeTaskStatus.DONE
+    assert task.result == {'job_id': 1}
+    assert task.expire_at is not None
+
+async def test_expired_lease_is_reaped_back_to_the_queue(queue):
+    await enqueue_job(1)
+    task = await scrape_queue.claim('dead-worker', lease_seconds=-1)
+
+    assert await scrape_queue.reap_expired_leases() == 1
+
+    task = await ScrapeTask.get(task.id)
+    assert task.status == ScrapeTaskStatus.PENDING
+    assert task.lease_owner is None
+    # the dead worker can't finish it anymore, and another one can claim it
+    assert not await scrape_queue.complete(task, 'dead-worker', {})
+    assert (await scrape_queue.claim('worker', lease_seconds=60)).id == task.id
+
+async def test_expired_lease_out_of_attempts_is_dead_lettered(queue):
+    await enqueue_job(1)
+    for _ in range(settings.SCRAPE_QUEUE_MAX_ATTEMPTS):
+        task = await scrape_queue.claim('dead-worker', lease_seconds=-1)
+        await scrape_queue.reap_expired_leases()
+
+    task = await ScrapeTask.get(task.id)
+    assert task.status == ScrapeTaskStatus.DEAD
+    assert task.active_key is None
+
+async def test_failed_task_is_retried_then_dead_lettered(queue):
+    await enqueue_job(1)
+
+    task = await scrape_queue.claim('worker', lease_seconds=60)
+    await scrape_queue.fail(task, 'worker', 'ConnectError')
+    assert (await ScrapeTask.get(task.id)).status == ScrapeTaskStatus.PENDING
+
+    task = await scrape_queue.claim('worker', lease_seconds=60)
+    assert task.attempts == 2
+    await scrape_queue.fail(task, 'worker', 'ConnectError')
+    task = await ScrapeTask.get(task.id)
+    assert task.status == ScrapeTaskStatus.DEAD
+    assert task.error == 'ConnectError'
+
+async def test_unretryable_failure_is_dead_lettered_at_once(queue):
+    await enqueue_job(1)
+    task = await scrape_queue.claim('worker', lease_seconds=60)
+
+    await scrape_queue.fail(task, 'worker', '404 Not Found', retryable=False)
+
+    assert (await ScrapeTask.get(task.id)).status == ScrapeTaskStatus.DEAD
+
+async def test_retry_waits_for_retry_after(queue):
+    await enqueue_job(1)
+    task = await scrape_queue.claim('worker', lease_seconds=60)
+
+    await scrape_queue.fail(task, 'worker', 'circuit open', retry_after=60, count_attempt=False)
+
+    assert await scrape_queue.claim('worker', lease_seconds=60) is None
+    assert (await ScrapeTask.get(task.id)).attempts == 0
+
+async def test_queued_scrapers_are_served_by_a_worker(queue, linkedin):
+    linkedin.failing_job_ids = {3}
+    worker = ScrapeWorker('worker', concurrency=4, lease_seconds=60, poll_interval_seconds=0.01)
+    worker_task = asyncio.create_task(worker.run())
+    try:
+        postings = await scrape_queue.QueuedJobPostScraper().get_postings(keywords='python', location='nyc', limit=10)
+        job_contents = await scrape_queue.QueuedJobContentScraper().get_jobs_content(
+            [int(posting['id']) for posting in postings]
+            )
+    finally:
+        worker.stop()
+        await worker_task
+
+    assert [int(posting['id']) for posting in postings] == list(range(10))
+    assert isinstance(job_contents[3], JobScrapeError)
+    assert all(isinstance(job_content, dict) for job_id, job_content in enumerate(job_contents) if job_id != 3)
+
+async def test_queued_scraper_times_out_without_workers(queue, monkeypatch):
+    monkeypatch.setattr(settings, 'SCRAPE_QUEUE_WAIT_TIMEOUT_SECONDS', 0.05)
+
+    with pytest.raises(scrape_queue.ScrapeTaskError) as e:
+        await scrape_queue.QueuedJobPostScraper().get_postings(keywords='python')
+    assert e.value.timed_out
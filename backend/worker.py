@@ -0,0 +1,54 @@
+"""scrape worker entry point, run as many of these as scraping needs, on as many machines:
+
+    python worker.py --concurrency 10
+
+works on the scrape tasks the api queues in mongo when SCRAPE_MODE is 'queue'
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import certifi
+from beanie import init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient
+from prometheus_client import start_http_server
+from app.models.scrape_tasks import ScrapeTask
+from app.core.config import settings
+from app.core.executor import worker_pool
+from app.core.http_client import start_scraper_client, close_scraper_client
+from app.services.scrape_worker import ScrapeWorker
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='work on the scrape task queue')
+    parser.add_argument('--worker-id', default=f'{socket.gethostname()}:{os.getpid()}')
+    parser.add_argument('--concurrency', type=int, default=settings.SCRAPE_WORKER_CONCURRENCY)
+    parser.add_argument('--metrics-port', type=int, default=None, help='serve prometheus metrics on this port')
+    return parser.parse_args(argv)
+
+async def run(args: argparse.Namespace):
+    client = AsyncIOMotorClient(settings.MONGO_URI, tlsCAFile=certifi.where())
+    await init_beanie(database=client['jobs_db'], document_models=[ScrapeTask])
+    worker_pool.start()
+    await start_scraper_client()
+    scrape_worker = ScrapeWorker(
+        worker_id=args.worker_id,
+        concurrency=args.concurrency,
+        lease_seconds=settings.SCRAPE_QUEUE_LEASE_SECONDS,
+        poll_interval_seconds=settings.SCRAPE_QUEUE_POLL_INTERVAL_SECONDS,
+    )
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, scrape_worker.stop)
+    try:
+        await scrape_worker.run()
+    finally:
+        await close_scraper_client()
+        worker_pool.shutdown()
+        client.close()
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.metrics_port is not None:
+        start_http_server(args.metrics_port)
+    asyncio.run(run(args))